@@ -1,7 +1,23 @@
 import os
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
 
+# Standalone copy of the resize engine in app/utils/resize.py, which documents the choices below.
+# Keep the two in sync so both bound memory the same way.
+REDUCING_GAP = 3.0
+DEFAULT_MAX_MEMORY_MB = int(os.environ.get("SYLVA3D_RESIZE_MAX_MEMORY_MB", 2048))
+REDUCE_MODES = ("L", "LA", "RGB", "RGBA", "I", "F", "CMYK", "YCbCr")
+
+def scaled_size(size, scale_percent):
+    width, height = size
+    return max(1, int(width * scale_percent / 100)), max(1, int(height * scale_percent / 100))
+
+def resize_to(image, size):
+    if size[0] < image.width and size[1] < image.height and image.mode in REDUCE_MODES:
+        return image.resize(size, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+    return image.resize(size, Image.LANCZOS)
+
 def resize_image(image, scale_percent):
     """
     Resize an image by a given percentage while maintaining the aspect ratio.
@@ -13,10 +29,67 @@ def resize_image(image, scale_percent):
     Returns:
     PIL.Image.Image: The resized image.
     """
-    width = int(image.width * scale_percent / 100)
-    height = int(image.height * scale_percent / 100)
-    resized_image = image.resize((width, height), Image.LANCZOS)
-    return resized_image
+    return resize_to(image, scaled_size(image.size, scale_percent))
+
+def draft_for_size(image, size):
+    if size[0] < image.width and size[1] < image.height:
+        image.draft(image.mode, size)
+    return image
+
+def reduce_factor(image_size, size):
+    return max(1, int(min(image_size[0] / size[0], image_size[1] / size[1]) / REDUCING_GAP))
+
+def estimate_memory(input_image_path, scale_percent):
+    """
+    Estimate the peak memory resize_path needs for an image, from its header only.
+
+    Parameters:
+    input_image_path (str): Path to the input image.
+    scale_percent (int): The percentage to scale the image.
+
+    Returns:
+    int: Bytes for the decoded (draft) image, the reduced copy and the resampling buffers.
+    """
+    with Image.open(input_image_path) as image:
+        size = scaled_size(image.size, scale_percent)
+        draft_for_size(image, size)
+        width, height = image.size
+        pixel_bytes = 1 if image.mode in ("1", "L", "P") else 4
+        reducible = image.mode in REDUCE_MODES
+    factor = reduce_factor((width, height), size) if reducible else 1
+    decoded = width * height * pixel_bytes
+    reduced = decoded // factor ** 2 if factor > 1 else 0
+    horizontal = size[0] * (height // factor) * pixel_bytes
+    return decoded + reduced + horizontal + size[0] * size[1] * pixel_bytes
+
+def resize_path(input_image_path, scale_percent):
+    """
+    Resize the image at a path. JPEGs are draft-decoded near the output size, large downscales
+    are box-reduced first and the full decode is released before the LANCZOS pass.
+
+    Parameters:
+    input_image_path (str): Path to the input image.
+    scale_percent (int): The percentage to scale the image.
+
+    Returns:
+    PIL.Image.Image: The resized image.
+    """
+    image = Image.open(input_image_path)
+    try:
+        size = scaled_size(image.size, scale_percent)
+        draft_for_size(image, size)
+        if image.mode not in REDUCE_MODES:
+            return resize_to(image, size)
+        factor = reduce_factor(image.size, size)
+        box = (0, 0) + image.size
+        if factor > 1:
+            reduced = image.reduce(factor)
+            image.close()
+            image = reduced
+            box = (0, 0, box[2] / factor, box[3] / factor)
+        return image.resize(size, Image.LANCZOS, box=box)
+    finally:
+        image.close()
 
 def create_output_folder(input_folder):
     """
@@ -34,33 +107,69 @@ def create_output_folder(input_folder):
         os.makedirs(output_folder)
     return output_folder
 
-def process_images(input_folder, scale_percent):
+def resize_file(task):
+    """
+    Resize one image and save it.
+
+    Parameters:
+    task (tuple): (input image path, output image path, scale percent).
+
+    Returns:
+    str: Path to the resized image.
+    """
+    input_image_path, output_image_path, scale_percent = task
+    resized_image = resize_path(input_image_path, scale_percent)
+    try:
+        resized_image.save(output_image_path)
+    finally:
+        resized_image.close()
+    print(f"Processed and saved: {output_image_path}")
+    return output_image_path
+
+def process_images(input_folder, scale_percent, processes=None, max_memory_mb=DEFAULT_MAX_MEMORY_MB):
     """
     Process all images in the input folder and save the resized images in the output folder.
+    Images are resized in parallel on a process pool, in chunks of consecutive files. Fewer
+    processes are started when the largest image would not fit max_memory_mb once per process.
 
     Parameters:
     input_folder (str): Path to the input folder containing images.
     scale_percent (int): The percentage to scale the images.
+    processes (int): Number of worker processes, defaults to the number of cores.
+    max_memory_mb (int): Memory the processes may use together, None for no limit.
+
+    Returns:
+    list: Paths to the resized images, in file name order.
     """
     output_folder = create_output_folder(input_folder)
 
-    for file_name in os.listdir(input_folder):
-        if file_name.lower().endswith(('png', 'jpg', 'jpeg', 'bmp', 'tiff')):
-            input_image_path = os.path.join(input_folder, file_name)
-            image = Image.open(input_image_path)
-            resized_image = resize_image(image, scale_percent)
-            output_image_path = os.path.join(output_folder, file_name)
-            resized_image.save(output_image_path)
-            print(f"Processed and saved: {output_image_path}")
+    tasks = [(os.path.join(input_folder, file_name), os.path.join(output_folder, file_name), scale_percent)
+             for file_name in sorted(os.listdir(input_folder))
+             if file_name.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.webp'))]
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    if max_memory_mb and processes > 1:
+        peak = max(estimate_memory(image_path, scale_percent) for image_path, _, scale_percent in tasks)
+        if peak * processes > max_memory_mb * 2 ** 20:
+            processes = max(1, max_memory_mb * 2 ** 20 // peak)
+            print(f"Resizing with {processes} processes, up to {peak / 2 ** 20:.0f} MB per image")
+    if processes <= 1:
+        return [resize_file(task) for task in tasks]
+
+    chunksize = max(1, len(tasks) // (processes * 4))
+    # A command line process has no GUI threads to protect, the platform's default start method is fine
+    with ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(resize_file, tasks, chunksize=chunksize))
 
 def main():
     parser = argparse.ArgumentParser(description="Resize images in a folder.")
     parser.add_argument("--input_folder", type=str, required=True, help="Path to the folder containing input images.")
     parser.add_argument("--scale_percent", type=int, required=True, help="Percentage to scale the images.")
-    
+    parser.add_argument("--processes", type=int, default=None, help="Number of worker processes, defaults to the number of cores.")
+    parser.add_argument("--max_memory_mb", type=int, default=DEFAULT_MAX_MEMORY_MB, help="Memory the resize processes may use together, in megabytes.")
+
     args = parser.parse_args()
-    
-    process_images(args.input_folder, args.scale_percent)
+
+    process_images(args.input_folder, args.scale_percent, args.processes, args.max_memory_mb)
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,18 @@
 import os
+import queue
+import threading
 import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog, messagebox, Canvas, Scrollbar, StringVar
 
-from utils import create_output_folder, extract_frames, extract_images
-from utils import create_thumbnail, create_video_output_folder, create_resize_output_folder
-from utils import resize_image, process_images
+from utils import create_output_folder, iter_frames, extract_images, FRAME_FORMATS
+from utils import load_thumbnail, create_video_output_folder, create_resize_output_folder
+from utils import resize_image, process_images, MaskCache, ThumbnailCache, OUTPUT_MODES, open_masked, write_colmap_masks
 
 import math
 import warnings
@@ -16,7 +20,203 @@ import cv2
 from PIL import Image, ImageTk
 
 from rembg_processor import remove_background_rembg
-from rm_bg import remove_background_briarmbg
+from model_registry import warm_up
+
+# Define the ThumbnailGrid class
+class ThumbnailGrid:
+    """ Grid of thumbnails drawn on a single canvas. Only the cells of the visible rows exist,
+    their canvas items are recycled while scrolling, so memory and redraw cost depend on
+    the viewport and not on the number of images.
+    Thumbnails are decoded on worker threads, cells show a placeholder until the Tk thread
+    picks the results up in batches. With a ThumbnailCache, decoded thumbnails persist on disk """
+    def __init__(self, parent, on_click, thumbnail_size=100, padding=10, workers=4, cached_thumbnails=1024,
+                 cache=None):
+        self.on_click = on_click
+        self.cache = cache
+        self.thumbnail_size = thumbnail_size
+        self.cell_size = thumbnail_size + padding
+        self.image_paths = []
+        self.columns = 1
+        self.cells = {}  # image index -> canvas item of the materialized cells
+        self.photos = {}  # image index -> PhotoImage of the materialized cells
+        self.spare_items = []  # hidden canvas items ready to be reused
+        self.thumbnails = OrderedDict()  # image path -> decoded PIL thumbnail, None if it failed, in LRU order
+        self.cached_thumbnails = cached_thumbnails
+        self.pending = {}  # image path -> future of the thumbnail being decoded
+        self.results = queue.Queue()  # (generation, image path, thumbnail) posted by the workers
+        self.generation = 0  # incremented by set_images, older results are dropped
+        self.polling = False
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+        self.placeholder = ImageTk.PhotoImage(Image.new('RGB', (thumbnail_size, thumbnail_size), '#444444'))
+
+        self.scrollbar = ctk.CTkScrollbar(parent, command=self.__scroll_y)
+        self.scrollbar.pack(side="right", fill="y", pady=10)
+        self.canvas = tk.Canvas(parent, width=250, height=600, bg='#333333', highlightthickness=0,
+                                yscrollcommand=self.scrollbar.set, yscrollincrement=self.cell_size // 2)
+        self.canvas.pack(fill="both", expand=True, pady=10)
+        self.canvas.bind('<Configure>', lambda event: self.__layout())  # canvas is resized
+        self.canvas.bind('<Button-1>', self.__click)
+        self.canvas.bind('<MouseWheel>', self.__wheel)  # scroll for Windows and MacOS, but not Linux
+        self.canvas.bind('<Button-5>', self.__wheel)  # scroll for Linux, wheel scroll down
+        self.canvas.bind('<Button-4>', self.__wheel)  # scroll for Linux, wheel scroll up
+
+    def set_images(self, image_paths):
+        """ Show image_paths from the top, replacing the current images """
+        for index in list(self.cells):
+            self.__release(index)
+        # Files may have changed since they were decoded (resize, background masks...)
+        self.generation += 1
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.thumbnails.clear()
+        self.image_paths = list(image_paths)
+        self.canvas.yview_moveto(0)
+        self.__layout()
+
+    def add_images(self, image_paths):
+        """ Append image_paths after the current images, the scroll position is kept """
+        self.image_paths.extend(image_paths)
+        self.__layout()
+
+    def __layout(self):
+        """ Update the number of columns and the scroll region, then redraw """
+        columns = max(1, self.canvas.winfo_width() // self.cell_size)
+        if columns != self.columns:
+            self.columns = columns
+            for index in list(self.cells):  # every cell moves
+                self.__release(index)
+        rows = -(-len(self.image_paths) // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, self.columns * self.cell_size, rows * self.cell_size))
+        self.__show_cells()
+
+    def __show_cells(self):
+        """ Materialize the cells of the visible rows and recycle the others """
+        top = int(self.canvas.canvasy(0))
+        bottom = int(self.canvas.canvasy(self.canvas.winfo_height()))
+        first = max(0, top // self.cell_size) * self.columns
+        last = min(len(self.image_paths), (bottom // self.cell_size + 1) * self.columns)
+        for index in list(self.cells):
+            if not first <= index < last:
+                self.__release(index)
+        for index in range(first, last):
+            if index not in self.cells:
+                self.__materialize(index)
+
+    def __materialize(self, index):
+        row, col = divmod(index, self.columns)
+        x = col * self.cell_size + self.cell_size // 2
+        y = row * self.cell_size + self.cell_size // 2
+        photo = self.__photo(self.image_paths[index])
+        if self.spare_items:
+            item = self.spare_items.pop()
+            self.canvas.coords(item, x, y)
+            self.canvas.itemconfigure(item, image=photo, state='normal')
+        else:
+            item = self.canvas.create_image(x, y, image=photo)
+        self.cells[index] = item
+        self.photos[index] = photo  # keep a reference to prevent garbage-collection
+
+    def __release(self, index):
+        item = self.cells.pop(index)
+        self.photos.pop(index, None)
+        self.canvas.itemconfigure(item, image='', state='hidden')
+        self.spare_items.append(item)
+        # Drop the decode if it has not started, the cell is no longer visible
+        image_path = self.image_paths[index] if index < len(self.image_paths) else None
+        future = self.pending.get(image_path)
+        if future is not None and future.cancel():
+            del self.pending[image_path]
+
+    def __photo(self, image_path):
+        """ PhotoImage of a decoded thumbnail, or the placeholder while the decode is scheduled """
+        if image_path in self.thumbnails:
+            self.thumbnails.move_to_end(image_path)
+            thumbnail = self.thumbnails[image_path]
+            return ImageTk.PhotoImage(thumbnail) if thumbnail is not None else self.placeholder
+        if image_path not in self.pending:
+            self.pending[image_path] = self.executor.submit(self.__decode, self.generation, image_path)
+        if not self.polling:
+            self.polling = True
+            self.canvas.after(50, self.__poll)
+        return self.placeholder
+
+    def __decode(self, generation, image_path):
+        """ Runs on a worker thread, never touches Tk """
+        key = None
+        if self.cache is not None:
+            # The cache only saves work, a failing lookup falls back to decoding the image
+            try:
+                key = self.cache.key(image_path, self.thumbnail_size)
+                thumbnail = self.cache.get(key)
+            except Exception as e:
+                print(f"Could not read the thumbnail cache for {image_path}: {e}")
+                key = thumbnail = None
+            if thumbnail is not None:
+                self.results.put((generation, image_path, thumbnail))
+                return
+        try:
+            thumbnail = load_thumbnail(image_path, (self.thumbnail_size, self.thumbnail_size))
+        except Exception as e:
+            print(f"Could not create thumbnail for {image_path}: {e}")
+            thumbnail = None
+        if key is not None and thumbnail is not None:
+            try:
+                self.cache.put(key, thumbnail)
+            except Exception as e:
+                print(f"Could not cache the thumbnail of {image_path}: {e}")
+        self.results.put((generation, image_path, thumbnail))
+
+    def __poll(self, batch_size=64):
+        """ Swap the placeholders of decoded thumbnails, a batch at a time so input stays responsive """
+        decoded = {}
+        while len(decoded) < batch_size:
+            try:
+                generation, image_path, thumbnail = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            self.pending.pop(image_path, None)
+            self.thumbnails[image_path] = thumbnail
+            decoded[image_path] = thumbnail
+        while len(self.thumbnails) > self.cached_thumbnails:
+            self.thumbnails.popitem(last=False)
+
+        for index, item in self.cells.items():
+            thumbnail = decoded.get(self.image_paths[index])
+            if thumbnail is not None:
+                photo = ImageTk.PhotoImage(thumbnail)
+                self.canvas.itemconfigure(item, image=photo)
+                self.photos[index] = photo
+
+        if self.pending or not self.results.empty():
+            self.canvas.after(50, self.__poll)
+        else:
+            self.polling = False
+
+    # noinspection PyUnusedLocal
+    def __scroll_y(self, *args, **kwargs):
+        """ Scroll canvas vertically and redraw the visible cells """
+        self.canvas.yview(*args)
+        self.__show_cells()
+
+    def __wheel(self, event):
+        """ Scroll with mouse wheel """
+        # Respond to Linux (event.num) or Windows (event.delta) wheel event
+        if event.num == 5 or event.delta < 0:
+            self.canvas.yview_scroll(1, 'units')
+        elif event.num == 4 or event.delta > 0:
+            self.canvas.yview_scroll(-1, 'units')
+        self.__show_cells()
+
+    def __click(self, event):
+        """ Open the image under the cursor """
+        col = int(self.canvas.canvasx(event.x)) // self.cell_size
+        row = int(self.canvas.canvasy(event.y)) // self.cell_size
+        index = row * self.columns + col
+        if col < self.columns and 0 <= index < len(self.image_paths):
+            self.on_click(self.image_paths[index])
 
 # Define the ShowImagesSection class
 class ShowImagesSection:
@@ -40,9 +240,8 @@ class ShowImagesSection:
         self.load_button = ctk.CTkButton(self.thumbnail_frame, text="Load Images", command=self.load_images)
         self.load_button.pack(pady=10)
 
-        self.scrollable_frame = ctk.CTkScrollableFrame(self.thumbnail_frame, width=250, height=600, fg_color="white")
-        self.scrollable_frame.pack(fill="both", expand=True, pady=10)
-        self.scrollable_frame.configure(fg_color="#333333")
+        # Re-opening a project reads the small cached thumbnails instead of the full images
+        self.thumbnail_grid = ThumbnailGrid(self.thumbnail_frame, self.show_image_callback, cache=ThumbnailCache())
 
     def load_images(self):
         folder_selected = filedialog.askdirectory()
@@ -52,30 +251,11 @@ class ShowImagesSection:
             self.display_images(self.loaded_image_paths)
 
     def display_images(self, image_paths):
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
+        self.thumbnail_grid.set_images(image_paths)
 
-        max_thumbnail_width = 100
-        max_columns = 5
-        frame_width = self.scrollable_frame.winfo_width()
-        max_columns = max(9, frame_width // (max_thumbnail_width + 10))
-
-        row = 0
-        col = 0
-
-        for image_path in image_paths:
-            thumbnail = create_thumbnail(image_path, (max_thumbnail_width, max_thumbnail_width))
-            label = ctk.CTkLabel(self.scrollable_frame, image=thumbnail, text="")
-            label.image = thumbnail
-            label.bind("<Button-1>", lambda e, img=image_path: self.show_image_callback(img))
-            label.grid(row=row, column=col, padx=5, pady=5)
-
-            col += 1
-            if col >= max_columns:
-                col = 0
-                row += 1
-
-        self.scrollable_frame.update_idletasks()
+    def add_images(self, image_paths):
+        """ Append thumbnails after the ones already shown, used while frames are still extracting """
+        self.thumbnail_grid.add_images(image_paths)
 
 # Define the ShowSingleImageSection class
 class AutoScrollbar(ttk.Scrollbar):
@@ -100,6 +280,14 @@ class CanvasImage:
         self.imscale = 1.0  # scale for the canvas image zoom, public for outer classes
         self.__delta = 1.3  # zoom magnitude
         self.__filter = Image.LANCZOS  # could be: NEAREST, BILINEAR, BICUBIC and LANCZOS
+        self.__fast_filter = Image.BILINEAR  # used while dragging or zooming, until the idle re-render
+        self.__idle_delay = 150  # ms without interaction before the high quality re-render
+        self.__idle_job = None  # pending high quality re-render
+        self.__reduction = 2  # reduction degree of image pyramid
+        self.__tile_size = 256  # side of the rendered tiles, in canvas pixels
+        self.__tiles = OrderedDict()  # (scale, level, column, row, filter) -> PhotoImage, in LRU order
+        self.__max_tiles = 128  # about 32 MB of rendered tiles
+        self.__tile_items = {}  # (column, row) -> (canvas image id, tile key) of the shown tiles
         self.__previous_state = 0  # previous state of the keyboard
         self.path = path  # path to the image, should be public for outer classes
         # Create ImageFrame in placeholder widget
@@ -135,10 +323,18 @@ class CanvasImage:
         # Open image
         with warnings.catch_warnings():  # suppress DecompressionBombWarning
             warnings.simplefilter('ignore')
-            self.__image = Image.open(self.path)  # open image, but don't load it
+            self.__image = open_masked(self.path)  # open image, background mask is applied if there is one
+        if self.__image.mode not in ('L', 'RGB', 'RGBA'):  # modes the pyramid reduction supports
+            self.__image = self.__image.convert('RGBA')
         self.imwidth, self.imheight = self.__image.size  # public for outer classes
         self.__min_side = min(self.imwidth, self.imheight)  # get the smaller image side
-        self.__pyramid = [Image.open(self.path)]  # only original image in pyramid
+        self.__pyramid = [self.__image]  # levels are added on first use, see __level
+        w, h = self.imwidth, self.imheight
+        self.__max_level = 0
+        while w > 512 and h > 512:  # top pyramid image is around 512 pixels in size
+            w /= self.__reduction
+            h /= self.__reduction
+            self.__max_level += 1
         # Put image into container rectangle and use it to set proper coordinates to the image
         self.container = self.canvas.create_rectangle((0, 0, self.imwidth, self.imheight), width=0)
         self.__show_image()  # show image on the canvas
@@ -167,16 +363,50 @@ class CanvasImage:
     def __scroll_x(self, *args, **kwargs):
         """ Scroll canvas horizontally and redraw the image """
         self.canvas.xview(*args)  # scroll horizontally
-        self.__show_image()  # redraw the image
+        self.__show_image(interactive=True)  # redraw the image
 
     # noinspection PyUnusedLocal
     def __scroll_y(self, *args, **kwargs):
         """ Scroll canvas vertically and redraw the image """
         self.canvas.yview(*args)  # scroll vertically
-        self.__show_image()  # redraw the image
-
-    def __show_image(self):
-        """ Show image on the Canvas. Implements correct image zoom almost like in Google Maps """
+        self.__show_image(interactive=True)  # redraw the image
+
+    def __level(self, level):
+        """ Pyramid level, each one is reduced from the previous level on first use """
+        while len(self.__pyramid) <= level:
+            self.__pyramid.append(self.__pyramid[-1].reduce(self.__reduction))
+        return self.__pyramid[level]
+
+    def __current_level(self):
+        """ Smallest pyramid level that still has at least one pixel per screen pixel """
+        if self.imscale >= 1:
+            return 0
+        return min(int(-math.log(self.imscale, self.__reduction)), self.__max_level)
+
+    def __tile(self, level, column, row, resample):
+        """ PhotoImage of one tile of the zoomed image, rendered from a pyramid level and cached """
+        key = (self.imscale, level, column, row, resample)
+        if key in self.__tiles:
+            self.__tiles.move_to_end(key)
+            return key, self.__tiles[key]
+        image = self.__level(level)
+        kx = image.width / self.imwidth * (1 / self.imscale)  # pyramid level pixels per canvas pixel
+        ky = image.height / self.imheight * (1 / self.imscale)
+        x1 = column * self.__tile_size  # tile box in canvas pixels, relative to the image corner
+        y1 = row * self.__tile_size
+        x2 = min(x1 + self.__tile_size, self.imwidth * self.imscale)
+        y2 = min(y1 + self.__tile_size, self.imheight * self.imscale)
+        box = (x1 * kx, y1 * ky, min(x2 * kx, image.width), min(y2 * ky, image.height))
+        size = (max(1, math.ceil(x2 - x1)), max(1, math.ceil(y2 - y1)))
+        tile = ImageTk.PhotoImage(image.resize(size, resample, box=box))
+        self.__tiles[key] = tile
+        while len(self.__tiles) > self.__max_tiles:
+            self.__tiles.popitem(last=False)
+        return key, tile
+
+    def __show_image(self, interactive=False):
+        """ Show image on the Canvas. Implements correct image zoom almost like in Google Maps.
+        Interactive redraws use the fast filter and schedule a high quality re-render on idle """
         box_image = self.canvas.coords(self.container)  # get image area
         box_canvas = (self.canvas.canvasx(0),  # get visible area of the canvas
                       self.canvas.canvasy(0),
@@ -200,16 +430,46 @@ class CanvasImage:
         y1 = max(box_canvas[1] - box_image[1], 0)
         x2 = min(box_canvas[2], box_image[2]) - box_image[0]
         y2 = min(box_canvas[3], box_image[3]) - box_image[1]
+        visible = {}
         if int(x2 - x1) > 0 and int(y2 - y1) > 0:  # show image if it in the visible area
-            image = self.__pyramid[0].crop(  # crop current img from pyramid
-                (int(x1 / self.imscale), int(y1 / self.imscale),
-                 int(x2 / self.imscale), int(y2 / self.imscale)))
-            imagetk = ImageTk.PhotoImage(image.resize((int(x2 - x1), int(y2 - y1)), self.__filter))
-            imageid = self.canvas.create_image(max(box_canvas[0], box_img_int[0]),
-                                               max(box_canvas[1], box_img_int[1]),
-                                               anchor='nw', image=imagetk)
-            self.canvas.lower(imageid)  # set image into background
-            self.canvas.imagetk = imagetk  # keep an extra reference to prevent garbage-collection
+            level = self.__current_level()
+            resample = self.__fast_filter if interactive else self.__filter
+            best_done = True  # every visible tile is rendered with the high quality filter
+            for row in range(int(y1 // self.__tile_size), int(math.ceil(y2 / self.__tile_size))):
+                for column in range(int(x1 // self.__tile_size), int(math.ceil(x2 / self.__tile_size))):
+                    best_key = (self.imscale, level, column, row, self.__filter)
+                    if best_key in self.__tiles:  # a high quality tile is as cheap as a fast one
+                        key, tile = self.__tile(level, column, row, self.__filter)
+                    else:
+                        key, tile = self.__tile(level, column, row, resample)
+                        best_done = best_done and resample == self.__filter
+                    x = box_image[0] + column * self.__tile_size
+                    y = box_image[1] + row * self.__tile_size
+                    shown = self.__tile_items.pop((column, row), None)
+                    if shown is None:
+                        imageid = self.canvas.create_image(x, y, anchor='nw', image=tile)
+                        self.canvas.lower(imageid)  # set image into background
+                    else:
+                        imageid = shown[0]
+                        self.canvas.coords(imageid, x, y)
+                        if shown[1] != key:
+                            self.canvas.itemconfigure(imageid, image=tile)
+                    visible[(column, row)] = (imageid, key)
+            if not best_done:
+                self.__schedule_best()
+        for imageid, _ in self.__tile_items.values():  # tiles out of the visible area
+            self.canvas.delete(imageid)
+        self.__tile_items = visible
+
+    def __schedule_best(self):
+        """ Re-render with the high quality filter once the user stops interacting """
+        if self.__idle_job is not None:
+            self.canvas.after_cancel(self.__idle_job)
+        self.__idle_job = self.canvas.after(self.__idle_delay, self.__show_best)
+
+    def __show_best(self):
+        self.__idle_job = None
+        self.__show_image()
 
     def __move_from(self, event):
         """ Remember previous coordinates for scrolling with the mouse """
@@ -218,7 +478,7 @@ class CanvasImage:
     def __move_to(self, event):
         """ Drag (move) canvas to the new position """
         self.canvas.scan_dragto(event.x, event.y, gain=1)
-        self.__show_image()  # zoom tile and show it on the canvas
+        self.__show_image(interactive=True)  # zoom tile and show it on the canvas
 
     def outside(self, x, y):
         """ Checks if the point (x,y) is outside the image area """
@@ -245,7 +505,7 @@ class CanvasImage:
             self.imscale *= self.__delta
             scale *= self.__delta
         self.canvas.scale('all', x, y, scale, scale)  # rescale all objects
-        self.__show_image()  # redraw the image
+        self.__show_image(interactive=True)  # redraw the image
 
 
 class ShowSingleImageSection:
@@ -282,12 +542,14 @@ class ShowSingleImageSection:
 
 # Define the FrameExtractionSection class
 class FrameExtractionSection:
-    def __init__(self, parent, get_video_path, get_output_path, display_images, set_images_path):
+    def __init__(self, parent, get_video_path, get_output_path, display_images, append_images, set_images_path):
         self.parent = parent
         self.get_video_path = get_video_path
         self.get_output_path = get_output_path
         self.display_images = display_images
+        self.append_images = append_images
         self.set_images_path = set_images_path
+        self.extracting = False
         self.configure_extraction_section()
 
     def configure_extraction_section(self):
@@ -307,13 +569,32 @@ class FrameExtractionSection:
         self.frame_rate_label = ctk.CTkLabel(frame_rate_frame, text="6 FPS", font=("Arial", 12))
         self.frame_rate_label.pack(side="left", padx=5)
 
-        extract_button = ctk.CTkButton(extraction_frame, text="Extract Frames", command=self.extract_frames)
-        extract_button.pack(pady=5)
+        # Keep the sharpest frame of each window and drop near duplicates, up to a frame budget
+        keyframe_frame = ctk.CTkFrame(extraction_frame)
+        keyframe_frame.pack(fill="x", pady=5)
+
+        self.keyframes_var = tk.BooleanVar(value=False)
+        keyframes_checkbox = ctk.CTkCheckBox(keyframe_frame, text="Keyframes", variable=self.keyframes_var)
+        keyframes_checkbox.pack(side="left", padx=5)
+
+        self.frame_budget_entry = ctk.CTkEntry(keyframe_frame, placeholder_text="Max frames", width=90)
+        self.frame_budget_entry.pack(side="left", padx=5)
+
+        # PNG is lossless, JPEG and WebP encode faster and are several times smaller
+        self.frame_format_var = ctk.StringVar(value="png")
+        self.frame_format_combobox = ctk.CTkComboBox(extraction_frame, values=list(FRAME_FORMATS),
+                                                     variable=self.frame_format_var)
+        self.frame_format_combobox.pack(pady=5)
+
+        self.extract_button = ctk.CTkButton(extraction_frame, text="Extract Frames", command=self.extract_frames)
+        self.extract_button.pack(pady=5)
 
     def update_frame_rate_label(self, value):
         self.frame_rate_label.configure(text=f"{int(value)} FPS")
 
     def extract_frames(self):
+        if self.extracting:
+            return
         frame_rate = int(self.frame_rate_slider.get())
         video_path = self.get_video_path()
         output_path = self.get_output_path()
@@ -321,14 +602,78 @@ class FrameExtractionSection:
             messagebox.showwarning("Warning", "Please select both video and output path.")
             return
 
+        keyframe_options = {}
+        if self.keyframes_var.get():
+            budget = self.frame_budget_entry.get().strip()
+            if budget and not budget.isdigit():
+                messagebox.showwarning("Warning", "Max frames must be a whole number.")
+                return
+            keyframe_options = {"budget": int(budget) if budget else None, "max_hash_distance": 4}
+
+        frame_format = self.frame_format_var.get()
+        if frame_format not in FRAME_FORMATS:
+            messagebox.showwarning("Warning", f"Frame format must be one of {', '.join(FRAME_FORMATS)}.")
+            return
+
         try:
             output_folder = create_video_output_folder(output_path, video_path)
-            loaded_image_paths = extract_frames(video_path, output_folder, frame_rate)
-            self.set_images_path(output_folder)  # Mettre à jour le chemin des images ici
-            self.display_images(loaded_image_paths)
-            messagebox.showinfo("Success", f"Frames extracted successfully at {output_folder}")
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {e}")
+            return
+
+        self.set_images_path(output_folder)  # Mettre à jour le chemin des images ici
+        self.display_images([])
+        self.extracting = True
+        self.extract_button.configure(state="disabled")
+
+        # Frames are extracted on a worker thread and shown as soon as they are written,
+        # the Tk thread polls the queue so the UI stays responsive while the video decodes
+        extracted = queue.Queue()
+        extracted_paths = []
+
+        def run():
+            try:
+                # Decode time segments of the video in parallel, half the cores leaves the UI responsive
+                for frame_path in iter_frames(video_path, output_folder, frame_rate,
+                                              processes=max(1, (os.cpu_count() or 1) // 2),
+                                              frame_format=frame_format, **keyframe_options):
+                    extracted.put(frame_path)
+                extracted.put(None)
+            except Exception as e:
+                extracted.put(e)
+
+        def poll():
+            frame_paths = []
+            done = None
+            while done is None:
+                try:
+                    item = extracted.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None or isinstance(item, Exception):
+                    done = item if item is not None else True
+                else:
+                    frame_paths.append(item)
+
+            if frame_paths:
+                extracted_paths.extend(frame_paths)
+                self.append_images(frame_paths)
+            if done is None:
+                self.parent.after(100, poll)
+                return
+
+            self.extracting = False
+            self.extract_button.configure(state="normal")
+            if isinstance(done, Exception):
+                messagebox.showerror("Error", f"An error occurred: {done}")
+            else:
+                # Segment workers finish out of order, show the frames in video order once all are written.
+                # Frame numbers are zero-padded to 4 digits and longer past 9999, so shorter names come first
+                self.display_images(sorted(extracted_paths, key=lambda path: (len(path), path)))
+                messagebox.showinfo("Success", f"Frames extracted successfully at {output_folder}")
+
+        threading.Thread(target=run, daemon=True).start()
+        self.parent.after(100, poll)
 
 # Define the ImageResizingSection class
 class ImageResizingSection:
@@ -383,6 +728,8 @@ class BackgroundRemovalSection:
         self.get_images_path = get_images_path
         self.display_images = display_images
         self.bg_removal_algorithm = "rembg"
+        self.output_mode = "rgba"
+        self.mask_cache = MaskCache()
         self.configure_background_removal_section()
 
     def configure_background_removal_section(self):
@@ -397,11 +744,23 @@ class BackgroundRemovalSection:
                                                   command=self.update_algorithm, variable=self.algorithm_var)
         self.algorithm_combobox.pack(pady=5)
 
+        # "mask" only stores an 8-bit mask per image, thumbnails and the viewer apply it on read
+        self.output_mode_var = ctk.StringVar(value="rgba")
+        self.output_mode_combobox = ctk.CTkComboBox(background_removal_frame, values=list(OUTPUT_MODES),
+                                                    command=self.update_output_mode, variable=self.output_mode_var)
+        self.output_mode_combobox.pack(pady=5)
+
         remove_background_button = ctk.CTkButton(background_removal_frame, text="Remove Background", command=self.remove_background)
         remove_background_button.pack(pady=5)
 
     def update_algorithm(self, choice):
         self.bg_removal_algorithm = choice
+        if choice == "briarmbg":
+            # Load torch and the BriaRMBG weights in the background while the user is still choosing
+            warm_up("briarmbg")
+
+    def update_output_mode(self, choice):
+        self.output_mode = choice
 
     def remove_background(self):
         images_path = self.get_images_path()
@@ -410,13 +769,15 @@ class BackgroundRemovalSection:
             return
 
         try:
+            # Frames already processed with the same settings are taken from the mask cache
             if self.bg_removal_algorithm == "rembg":
-                remove_background_rembg(images_path, images_path)
+                remove_background_rembg(images_path, images_path, cache=self.mask_cache, output_mode=self.output_mode)
             else:
-                remove_background_briarmbg(images_path, images_path)
+                from rm_bg import remove_background_briarmbg  # imports torch, keep it out of app start-up
+                remove_background_briarmbg(images_path, images_path, cache=self.mask_cache, output_mode=self.output_mode)
 
             self.display_images(extract_images(images_path))
-            messagebox.showinfo("Success", f"Background removed successfully with {self.bg_removal_algorithm}.")
+            messagebox.showinfo("Success", f"Background removed successfully with {self.bg_removal_algorithm}.\n{self.mask_cache.report()}")
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {e}")
 
@@ -493,6 +854,14 @@ class PhotogrammetrySection:
             use_gpu = -1 if self.use_gpu_var.get() else -2  # -1 for GPU, -2 for CPU
             output_format = self.output_format_var.get()
 
+            # Binary masks let COLMAP skip background pixels, written next to the images each script copies
+            if self.processing_option.get() == "point_cloud":
+                source_folder = os.path.join(project_path, folder_name, "images")
+            else:
+                source_folder = os.path.join(project_path, folder_name)
+            if os.path.isdir(source_folder):
+                write_colmap_masks(source_folder)
+
             if self.processing_option.get() == "point_cloud":
                 self.run_script("colmap_demo.sh", project_path, folder_name, texture_size, use_gpu, output_format)
             else:
@@ -569,7 +938,7 @@ class PhotogrammetryPage(ctk.CTkFrame):
         self.show_single_image_section = ShowSingleImageSection(self)
         self.sidebar_section = SidebarSection(self, self.choose_output_path)
 
-        self.frame_extraction_section = FrameExtractionSection(self.sidebar_section.sidebar_frame, self.get_video_path, self.get_output_path, self.display_images, self.set_images_path)
+        self.frame_extraction_section = FrameExtractionSection(self.sidebar_section.sidebar_frame, self.get_video_path, self.get_output_path, self.display_images, self.append_images, self.set_images_path)
         self.image_resizing_section = ImageResizingSection(self.sidebar_section.sidebar_frame, self.get_images_path, self.display_images)
         self.background_removal_section = BackgroundRemovalSection(self.sidebar_section.sidebar_frame, self.get_images_path, self.display_images)
         self.photogrammetry_section = PhotogrammetrySection(self.sidebar_section.sidebar_frame, self.get_images_path)
@@ -616,6 +985,12 @@ class PhotogrammetryPage(ctk.CTkFrame):
             self.set_images_path(os.path.dirname(self.loaded_image_paths[0]))
         self.show_images_section.display_images(image_paths)
 
+    def append_images(self, image_paths):
+        self.loaded_image_paths = self.loaded_image_paths + list(image_paths)
+        if self.loaded_image_paths:
+            self.set_images_path(os.path.dirname(self.loaded_image_paths[0]))
+        self.show_images_section.add_images(image_paths)
+
     def configure_video_section(self):
         self.video_section_frame = ctk.CTkFrame(self, width=700, height=150)
         self.video_section_frame.grid(row=0, column=1, sticky="nswe", padx=10, pady=10)
@@ -0,0 +1,78 @@
+"""
+Compare BriaRMBG.forward (six side outputs) with BriaRMBG.inference (first side output only).
+
+Each mode runs in its own process so the reported peak resident memory is not shared.
+The weights are random: only latency and memory are measured, not mask quality.
+"""
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import resource
+import time
+
+import torch
+from briarmbg import BriaRMBG
+from utils.common import process_context
+
+
+def peak_memory_mb():
+    if torch.cuda.is_available():
+        return torch.cuda.max_memory_allocated() / 2 ** 20
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+
+def run(mode, batch_size, size, repeats, queue):
+    torch.manual_seed(0)
+    net = BriaRMBG().eval()
+    x = torch.randn(batch_size, 3, size, size)
+    if torch.cuda.is_available():
+        net, x = net.cuda(), x.cuda()
+
+    def step():
+        if mode == "forward":
+            with torch.no_grad():
+                net(x)
+        else:
+            with torch.inference_mode():
+                net.inference(x)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+
+    step()  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        step()
+        timings.append(time.perf_counter() - start)
+    queue.put((min(timings), sum(timings) / len(timings), peak_memory_mb()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BriaRMBG forward vs inference.")
+    parser.add_argument("--batch_size", type=int, default=1, help="Images per forward pass.")
+    parser.add_argument("--size", type=int, default=1024, help="Input resolution.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per mode.")
+    args = parser.parse_args()
+
+    context = process_context()
+    results = {}
+    for mode in ("forward", "inference"):
+        queue = context.Queue()
+        process = context.Process(target=run, args=(mode, args.batch_size, args.size, args.repeats, queue))
+        process.start()
+        results[mode] = queue.get()
+        process.join()
+        best, mean, peak = results[mode]
+        print(f"{mode:>9}: best {best * 1000:8.1f} ms  mean {mean * 1000:8.1f} ms  peak {peak:8.1f} MB")
+
+    forward, inference = results["forward"], results["inference"]
+    print(f"    delta: latency {(inference[1] - forward[1]) * 1000:+.1f} ms ({inference[1] / forward[1] - 1:+.1%}), "
+          f"peak memory {inference[2] - forward[2]:+.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compare the encoders frame extraction can write with: encode time, size on disk and the
+decode time every downstream step (thumbnails, background removal, COLMAP) pays again.
+
+Raw .npy files and a single memory-mapped frame store are measured as a lower bound for
+decoding, they are not images the rest of the pipeline can read.
+"""
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from utils.frames import frame_encoder
+
+
+def read_frames(video_path, count):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video {video_path}")
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise ValueError(f"No frames decoded from {video_path}")
+    return frames
+
+
+def psnr(reference, frame):
+    mse = np.mean((reference.astype(np.float64) - frame.astype(np.float64)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def bench_images(frames, folder, frame_format, quality):
+    extension, params = frame_encoder(frame_format, quality)
+    paths = [os.path.join(folder, f"frame_{i:04d}{extension}") for i in range(len(frames))]
+
+    start = time.perf_counter()
+    for path, frame in zip(paths, frames):
+        cv2.imwrite(path, frame, params)
+    encode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = [cv2.imread(path) for path in paths]
+    decode = time.perf_counter() - start
+
+    size = sum(os.path.getsize(path) for path in paths)
+    quality = min(psnr(frame, image) for frame, image in zip(frames, decoded))
+    return encode, size, decode, quality
+
+
+def bench_npy(frames, folder):
+    paths = [os.path.join(folder, f"frame_{i:04d}.npy") for i in range(len(frames))]
+
+    start = time.perf_counter()
+    for path, frame in zip(paths, frames):
+        np.save(path, frame)
+    encode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for path in paths:
+        np.load(path)
+    decode = time.perf_counter() - start
+
+    return encode, sum(os.path.getsize(path) for path in paths), decode, float('inf')
+
+
+def bench_memmap(frames, folder):
+    path = os.path.join(folder, "frames.npy")
+
+    start = time.perf_counter()
+    store = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(len(frames),) + frames[0].shape)
+    for i, frame in enumerate(frames):
+        store[i] = frame
+    store.flush()
+    del store
+    encode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = np.load(path, mmap_mode='r')
+    for i in range(len(frames)):
+        np.array(store[i])
+    decode = time.perf_counter() - start
+    del store
+
+    return encode, os.path.getsize(path), decode, float('inf')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the frame extraction output formats.")
+    parser.add_argument("--video", type=str, required=True, help="Video to take the frames from.")
+    parser.add_argument("--frames", type=int, default=50, help="Number of frames to encode.")
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    h, w = frames[0].shape[:2]
+    print(f"{len(frames)} frames of {w}x{h}")
+
+    cases = [("png", 1), ("png", 3), ("png", 9), ("jpg", 95), ("jpg", 90), ("webp", 95), ("webp", 101)]
+    print(f"{'format':<12}{'encode ms/frame':>17}{'MB':>10}{'decode ms/frame':>17}{'min PSNR dB':>13}")
+    for name, run in ([(f"{f} {q}", lambda folder, f=f, q=q: bench_images(frames, folder, f, q)) for f, q in cases]
+                      + [("npy", lambda folder: bench_npy(frames, folder)),
+                         ("memmap", lambda folder: bench_memmap(frames, folder))]):
+        folder = tempfile.mkdtemp(prefix="frame_formats_")
+        try:
+            encode, size, decode, quality = run(folder)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        print(f"{name:<12}{encode / len(frames) * 1000:>17.2f}{size / 2 ** 20:>10.1f}"
+              f"{decode / len(frames) * 1000:>17.2f}{quality:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
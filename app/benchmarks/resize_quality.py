@@ -0,0 +1,79 @@
+"""
+Check the fast resize path (JPEG draft decoding + box reduce) against a full decode followed
+by a plain LANCZOS resize: time per image and PSNR of the fast result against the reference.
+
+Exits with status 1 when an image falls below --min_psnr.
+"""
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+
+import numpy as np
+from PIL import Image
+
+from utils.common import is_image_file
+from utils.resize import resize_path
+
+
+def reference_resize(image_path, scale_percent):
+    with Image.open(image_path) as image:
+        width = max(1, int(image.width * scale_percent / 100))
+        height = max(1, int(image.height * scale_percent / 100))
+        return image.resize((width, height), Image.LANCZOS)
+
+
+def fast_resize(image_path, scale_percent):
+    return resize_path(image_path, scale_percent)
+
+
+def psnr(reference, image):
+    a = np.asarray(reference.convert("RGB"), dtype=np.float64)
+    b = np.asarray(image.convert("RGB"), dtype=np.float64)
+    mse = np.mean((a - b) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def timed(resize, image_path, scale_percent):
+    start = time.perf_counter()
+    image = resize(image_path, scale_percent)
+    return image, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fast resize path with a full-decode LANCZOS resize.")
+    parser.add_argument("--images_folder", type=str, required=True, help="Folder of images, ideally large JPEGs.")
+    parser.add_argument("--scale_percent", type=int, nargs="+", default=[10, 25, 50], help="Scales to check.")
+    parser.add_argument("--min_psnr", type=float, default=35.0, help="Lowest acceptable PSNR in dB.")
+    args = parser.parse_args()
+
+    image_paths = sorted(os.path.join(args.images_folder, file_name) for file_name in os.listdir(args.images_folder)
+                         if is_image_file(file_name))
+    if not image_paths:
+        raise ValueError(f"No images found in {args.images_folder}")
+
+    failed = False
+    print(f"{'scale':>6}{'reference ms':>14}{'fast ms':>10}{'min PSNR dB':>13}")
+    for scale_percent in args.scale_percent:
+        reference_time = fast_time = 0.0
+        worst = float('inf')
+        for image_path in image_paths:
+            reference, elapsed = timed(reference_resize, image_path, scale_percent)
+            reference_time += elapsed
+            image, elapsed = timed(fast_resize, image_path, scale_percent)
+            fast_time += elapsed
+            worst = min(worst, psnr(reference, image))
+        failed = failed or worst < args.min_psnr
+        print(f"{scale_percent:>5}%{reference_time / len(image_paths) * 1000:>14.1f}"
+              f"{fast_time / len(image_paths) * 1000:>10.1f}{worst:>13.1f}")
+
+    if failed:
+        print(f"PSNR below {args.min_psnr} dB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
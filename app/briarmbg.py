@@ -385,7 +385,7 @@ class BriaRMBG(nn.Module):
 
         # self.outconv = nn.Conv2d(6*out_ch,out_ch,1)
 
-    def forward(self,x):
+    def features(self,x):
 
         hx = x
 
@@ -431,6 +431,11 @@ class BriaRMBG(nn.Module):
 
         hx1d = self.stage1d(torch.cat((hx2dup,hx1),1))
 
+        return hx1d,hx2d,hx3d,hx4d,hx5d,hx6
+
+    def forward(self,x):
+
+        hx1d,hx2d,hx3d,hx4d,hx5d,hx6 = self.features(x)
 
         #side output
         d1 = self.side1(hx1d)
@@ -451,4 +456,15 @@ class BriaRMBG(nn.Module):
         d6 = self.side6(hx6)
         d6 = _upsample_like(d6,x)
 
-        return [F.sigmoid(d1), F.sigmoid(d2), F.sigmoid(d3), F.sigmoid(d4), F.sigmoid(d5), F.sigmoid(d6)],[hx1d,hx2d,hx3d,hx4d,hx5d,hx6]
\ No newline at end of file
+        return [F.sigmoid(d1), F.sigmoid(d2), F.sigmoid(d3), F.sigmoid(d4), F.sigmoid(d5), F.sigmoid(d6)],[hx1d,hx2d,hx3d,hx4d,hx5d,hx6]
+
+    def inference(self,x):
+
+        # only the first side output is used for the mask, skip the five other heads and their upsamples.
+        # d1 is returned at its own resolution, half the input's, the caller crops the letterbox
+        # and resamples it to the image size in one pass
+        hx1d = self.features(x)[0]
+
+        d1 = self.side1(hx1d)
+
+        return F.sigmoid(d1)
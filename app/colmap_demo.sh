@@ -30,9 +30,20 @@ if ! command -v colmap &> /dev/null; then
     exit 1
 fi
 
+# Masques COLMAP écrits par l'application après la suppression du background
+MASK_PATH="${DATASET_PATH}/images/rmbg/colmap_masks"
+MASK_ARGS=()
+
 # Copier les images dans le dossier result/images
 mkdir -p "$IMAGE_PATH"
-cp -r "${DATASET_PATH}/images/"* "$IMAGE_PATH"
+if [ -d "$MASK_PATH" ]; then
+    # Seulement les images d'origine : les sous-dossiers rmbg (détourages, masques) ne doivent pas être extraits
+    find "${DATASET_PATH}/images" -maxdepth 1 -type f -exec cp {} "$IMAGE_PATH" \;
+    MASK_ARGS=(--ImageReader.mask_path "$MASK_PATH")
+    echo "Utilisation des masques de fond : $MASK_PATH"
+else
+    cp -r "${DATASET_PATH}/images/"* "$IMAGE_PATH"
+fi
 
 # Vérifier si le dossier des images existe
 if [ ! -d "$IMAGE_PATH" ]; then
@@ -88,7 +99,8 @@ echo "Extraction des features..."
 colmap feature_extractor \
     --database_path "$DATABASE_PATH" \
     --image_path "$IMAGE_PATH" \
-    --SiftExtraction.max_image_size 3200
+    --SiftExtraction.max_image_size 3200 \
+    "${MASK_ARGS[@]}"
 
 # Correspondance des caractéristiques
 echo "Matching des features..."
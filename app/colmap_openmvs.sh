@@ -19,6 +19,13 @@ if [ ! -f /swapfile ]; then
     echo '/swapfile none swap sw 0 0' | sudo tee -a /etc/fstab
 fi
 
+# Background masks written by the application after background removal
+MASK_PATH=${DATASET_PATH}/rmbg/colmap_masks
+MASK_ARGS=""
+if [ -d "$MASK_PATH" ]; then
+    MASK_ARGS="--ImageReader.mask_path ${MASK_PATH}"
+fi
+
 # Create necessary directories
 mkdir -p ${PROJECT}/images
 mkdir -p ${PROJECT}/sparse
@@ -72,7 +79,8 @@ if [ "$LAST_COMPLETED_STEP" -lt "2" ]; then
         --SiftExtraction.use_gpu 0 \
         --SiftExtraction.max_image_size 1024 \
         --database_path ${PROJECT}/database.db \
-        --image_path ${PROJECT}/images
+        --image_path ${PROJECT}/images \
+        $MASK_ARGS
     save_state 2 "completed"
 fi
 
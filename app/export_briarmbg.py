@@ -0,0 +1,178 @@
+"""
+Export BriaRMBG as an optimized CPU artifact and check it against the fp32 model.
+
+    python export_briarmbg.py export --calibration_folder <images> [--quantize int8|none]
+    python export_briarmbg.py check --images_folder <images>
+
+The artifact is a frozen TorchScript module computing BriaRMBG.inference with BatchNorm
+folded into the convolutions, channels-last activations and, with --quantize int8, static
+int8 quantization calibrated on the given images. model_registry loads it instead of the
+fp32 weights when no GPU is available, so export only saves it there once its masks pass the
+check (--max_error, --min_iou) on the calibration images. check exits non-zero below them.
+Artifacts exported before inference returned the half-resolution side output still load,
+masks are resampled from whatever resolution the artifact predicts at; re-export to skip
+the full-resolution upsample inside the model.
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import torch
+import torch.nn as nn
+from PIL import Image
+
+from briarmbg import REBNCONV, myrebnconv
+from model_registry import OPTIMIZED_BRIARMBG_PATH, load_briarmbg_fp32, load_briarmbg_optimized
+from rm_bg import to_tensor, mask_to_array
+from utils import is_image_file
+
+
+class InferenceModule(nn.Module):
+    def __init__(self, net):
+        super().__init__()
+        self.net = net
+
+    def forward(self, x):
+        x = x.contiguous(memory_format=torch.channels_last)
+        return self.net.inference(x)
+
+
+def fold_batchnorm(net):
+    """ Fold every conv + BatchNorm + ReLU block into a single fused conv, in place """
+    for module in net.modules():
+        if isinstance(module, REBNCONV):
+            torch.ao.quantization.fuse_modules(module, [["conv_s1", "bn_s1", "relu_s1"]], inplace=True)
+        elif isinstance(module, myrebnconv):
+            torch.ao.quantization.fuse_modules(module, [["conv", "bn", "rl"]], inplace=True)
+    return net
+
+
+def list_images(folder, limit=None):
+    file_names = sorted(file_name for file_name in os.listdir(folder) if is_image_file(file_name))
+    return [os.path.join(folder, file_name) for file_name in file_names[:limit]]
+
+
+def quantize_int8(module, calibration_paths, example):
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    # prepare_fx folds conv + BatchNorm + ReLU itself before inserting observers
+    prepared = prepare_fx(module, get_default_qconfig_mapping("x86"), example_inputs=(example,))
+    with torch.inference_mode():
+        for path in calibration_paths:
+            prepared(to_tensor(Image.open(path)).unsqueeze(0))
+    return convert_fx(prepared)
+
+
+def export(output_path, calibration_folder, quantize="int8", num_calibration=32):
+    calibration_paths = list_images(calibration_folder, num_calibration)
+    if not calibration_paths:
+        raise ValueError(f"No images found in {calibration_folder}")
+
+    net = load_briarmbg_fp32().cpu()
+    example = to_tensor(Image.open(calibration_paths[0])).unsqueeze(0)
+    if quantize == "int8":
+        module = quantize_int8(InferenceModule(net).eval(), calibration_paths, example)
+    else:
+        module = InferenceModule(fold_batchnorm(net)).eval()
+        module = module.to(memory_format=torch.channels_last)
+
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(module, example))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    torch.jit.save(traced, output_path)
+    print(f"Exported BriaRMBG to {output_path}")
+    return output_path
+
+
+DEFAULT_MAX_ERROR = 2.0  # mean abs mask error, out of 255
+DEFAULT_MIN_IOU = 0.95  # worst IoU of the masks thresholded at 128
+
+
+def check(artifact_path, images_folder, limit=16):
+    """ Compare the masks of the artifact with the fp32 masks, returns (mean abs error, worst IoU) """
+    reference = load_briarmbg_fp32().cpu()
+    optimized = load_briarmbg_optimized(artifact_path)
+
+    errors = []
+    ious = []
+    for path in list_images(images_folder, limit):
+        image = Image.open(path)
+        batch = to_tensor(image).unsqueeze(0)
+        input_size = (batch.shape[3], batch.shape[2])
+        with torch.inference_mode():
+            expected = mask_to_array(reference.inference(batch), image.size, input_size).astype(np.int16)
+            actual = mask_to_array(optimized.inference(batch), image.size, input_size).astype(np.int16)
+        error = np.abs(expected - actual).mean()
+        union = np.logical_or(expected >= 128, actual >= 128).sum()
+        iou = np.logical_and(expected >= 128, actual >= 128).sum() / union if union else 1.0
+        errors.append(error)
+        ious.append(iou)
+        print(f"{os.path.basename(path)}: mean abs error {error:.2f}/255, IoU {iou:.4f}")
+
+    if not errors:
+        raise ValueError(f"No images found in {images_folder}")
+    print(f"Mean abs error {np.mean(errors):.2f}/255, worst IoU {min(ious):.4f} over {len(errors)} images")
+    return float(np.mean(errors)), float(min(ious))
+
+
+def passes(error, iou, max_error=DEFAULT_MAX_ERROR, min_iou=DEFAULT_MIN_IOU):
+    if error > max_error or iou < min_iou:
+        print(f"Check failed: mean abs error {error:.2f}/255 (max {max_error}), worst IoU {iou:.4f} (min {min_iou})")
+        return False
+    return True
+
+
+def export_checked(output_path, calibration_folder, quantize="int8", num_calibration=32,
+                   max_error=DEFAULT_MAX_ERROR, min_iou=DEFAULT_MIN_IOU):
+    """ Export next to output_path, then move the artifact to output_path only if it passes the check.
+    Returns True when the artifact was saved """
+    candidate_path = f"{output_path}.candidate"
+    export(candidate_path, calibration_folder, quantize, num_calibration)
+    try:
+        error, iou = check(candidate_path, calibration_folder)
+        if not passes(error, iou, max_error, min_iou):
+            print(f"Not saving the artifact to {output_path}")
+            return False
+        os.replace(candidate_path, output_path)
+        print(f"Saved optimized BriaRMBG to {output_path}")
+        return True
+    finally:
+        if os.path.exists(candidate_path):
+            os.remove(candidate_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export BriaRMBG as an optimized CPU artifact.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write the optimized artifact.")
+    export_parser.add_argument("--calibration_folder", type=str, required=True, help="Images used for calibration and the accuracy check.")
+    export_parser.add_argument("--output", type=str, default=OPTIMIZED_BRIARMBG_PATH, help="Path of the artifact.")
+    export_parser.add_argument("--quantize", choices=["int8", "none"], default="int8", help="Static int8 quantization or fp32 only.")
+    export_parser.add_argument("--num_calibration", type=int, default=32, help="Number of calibration images.")
+    export_parser.add_argument("--max_error", type=float, default=DEFAULT_MAX_ERROR, help="Largest mean abs mask error, out of 255.")
+    export_parser.add_argument("--min_iou", type=float, default=DEFAULT_MIN_IOU, help="Smallest IoU of any mask.")
+
+    check_parser = subparsers.add_parser("check", help="Compare the artifact masks with the fp32 masks.")
+    check_parser.add_argument("--images_folder", type=str, required=True, help="Images to compare on.")
+    check_parser.add_argument("--artifact", type=str, default=OPTIMIZED_BRIARMBG_PATH, help="Path of the artifact.")
+    check_parser.add_argument("--limit", type=int, default=16, help="Number of images to compare.")
+    check_parser.add_argument("--max_error", type=float, default=DEFAULT_MAX_ERROR, help="Largest mean abs mask error, out of 255.")
+    check_parser.add_argument("--min_iou", type=float, default=DEFAULT_MIN_IOU, help="Smallest IoU of any mask.")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        ok = export_checked(args.output, args.calibration_folder, args.quantize, args.num_calibration,
+                            args.max_error, args.min_iou)
+    else:
+        ok = passes(*check(args.artifact, args.images_folder, args.limit), args.max_error, args.min_iou)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import threading
+
+# Heavy dependencies (torch, huggingface_hub, briarmbg) are only imported by the
+# loaders below, so importing this module costs nothing at application start.
+
+_models = {}
+_lock = threading.Lock()
+
+
+# CPU artifact written by export_briarmbg.py, preferred over the fp32 weights when there is no GPU
+OPTIMIZED_BRIARMBG_PATH = os.environ.get(
+    "SYLVA3D_BRIARMBG_ARTIFACT",
+    os.path.join(os.path.expanduser("~"), ".cache", "sylva3d", "briarmbg_cpu.pt"))
+
+
+class TracedBriaRMBG:
+    """ Gives a traced artifact the same inference() method as BriaRMBG """
+    def __init__(self, module):
+        self.module = module
+
+    def inference(self, x):
+        return self.module(x)
+
+
+def load_briarmbg_fp32():
+    import torch
+    from huggingface_hub import hf_hub_download
+    from briarmbg import BriaRMBG
+
+    net = BriaRMBG()
+    model_path = hf_hub_download("briaai/RMBG-1.4", 'model.pth')
+    if torch.cuda.is_available():
+        net.load_state_dict(torch.load(model_path))
+        net = net.cuda()
+    else:
+        net.load_state_dict(torch.load(model_path, map_location="cpu"))
+    net.eval()
+    return net
+
+
+def load_briarmbg_optimized(path=OPTIMIZED_BRIARMBG_PATH):
+    import torch
+
+    return TracedBriaRMBG(torch.jit.load(path, map_location="cpu"))
+
+
+def uses_optimized_briarmbg():
+    import torch
+
+    return not torch.cuda.is_available() and os.path.exists(OPTIMIZED_BRIARMBG_PATH)
+
+
+def briarmbg_version():
+    """ Identifies the weights _load_briarmbg picks, so cached masks are not reused across models """
+    if uses_optimized_briarmbg():
+        return f"RMBG-1.4+{os.path.basename(OPTIMIZED_BRIARMBG_PATH)}@{os.path.getmtime(OPTIMIZED_BRIARMBG_PATH):.0f}"
+    return "RMBG-1.4"
+
+
+def _load_briarmbg():
+    if uses_optimized_briarmbg():
+        try:
+            net = load_briarmbg_optimized()
+            print(f"Using optimized BriaRMBG artifact {OPTIMIZED_BRIARMBG_PATH}")
+            return net
+        except Exception as e:
+            print(f"Failed to load {OPTIMIZED_BRIARMBG_PATH}, falling back to fp32 weights: {e}")
+    return load_briarmbg_fp32()
+
+
+_loaders = {
+    "briarmbg": _load_briarmbg,
+}
+
+
+def register_model(name, loader):
+    _loaders[name] = loader
+
+
+def is_registered(name):
+    return name in _loaders
+
+
+def get_model(name):
+    """ Return the model registered under name, loading it on first use """
+    with _lock:
+        if name not in _models:
+            if name not in _loaders:
+                raise KeyError(f"Unknown model: {name}")
+            _models[name] = _loaders[name]()
+        return _models[name]
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def unload_model(name):
+    with _lock:
+        _models.pop(name, None)
+
+
+def warm_up(name, callback=None):
+    """ Load the model on a daemon thread; callback(error) is called when done """
+    def run():
+        error = None
+        try:
+            get_model(name)
+        except Exception as e:
+            error = e
+            print(f"Failed to warm up {name}: {e}")
+        if callback is not None:
+            callback(error)
+
+    thread = threading.Thread(target=run, name=f"warm_up_{name}", daemon=True)
+    thread.start()
+    return thread
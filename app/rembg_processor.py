@@ -1,22 +1,134 @@
 import os
-from rembg import remove
-from PIL import Image
-from utils import create_output_folder
+from rembg import new_session, remove
+from PIL import Image, ImageOps
+from model_registry import get_model, is_registered, register_model
+from utils import create_output_folder, create_mask_folder, mask_file_name, save_mask, composite, run_pipeline, OUTPUT_MODES
+from utils import is_image_file, process_pool
 
-def process_image(input_path, output_path):
+DEFAULT_MODEL = "u2net"
+
+def _new_session(model_name, threads):
+    # rembg reads the onnxruntime thread count from OMP_NUM_THREADS when the session is created
+    previous = os.environ.get("OMP_NUM_THREADS")
+    if threads:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+    try:
+        return new_session(model_name)
+    finally:
+        if threads:
+            if previous is None:
+                os.environ.pop("OMP_NUM_THREADS")
+            else:
+                os.environ["OMP_NUM_THREADS"] = previous
+
+def get_session(model_name=DEFAULT_MODEL, threads=None):
+    """ Return a rembg session shared by every image of the process """
+    key = f"rembg_{model_name}_{threads or 'auto'}"
+    if not is_registered(key):
+        register_model(key, lambda: _new_session(model_name, threads))
+    return get_model(key)
+
+def process_image(input_path, output_path, session=None):
     try:
         input_image = Image.open(input_path)
-        output_image = remove(input_image)
+        output_image = remove(input_image, session=session or get_session())
         output_image.save(output_path, format='PNG')
         print(f"Processed and saved: {output_path}")
     except Exception as e:
         print(f"Failed to process {input_path}: {e}")
 
-def remove_background_rembg(input_folder, output_folder):
-    output_folder = create_output_folder(output_folder)
-    
-    for file_name in os.listdir(input_folder):
-        if file_name.lower().endswith(('png', 'jpg', 'jpeg', 'bmp', 'tiff')):
-            input_image_path = os.path.join(input_folder, file_name)
+def _remove_background_files(input_folder, output_folder, file_names, model_name, threads,
+                             decode_workers, encode_workers, max_pending, cache=None, output_mode="rgba"):
+    session = get_session(model_name, threads)
+
+    def decode(file_name):
+        input_image_path = os.path.join(input_folder, file_name)
+        key = cache.key(input_image_path, "rembg", model_name) if cache is not None else None
+        mask = cache.get(key) if cache is not None else None
+        # rembg computes masks on the EXIF-upright image, compose and cache in that frame too
+        image = ImageOps.exif_transpose(Image.open(input_image_path))
+        return image, key, mask
+
+    def infer(decoded):
+        # Cached frames already have their mask
+        return [mask if mask is not None else remove(image, session=session, only_mask=True)
+                for image, _, mask in decoded]
+
+    def encode(file_name, decoded, mask):
+        image, key, cached_mask = decoded
+        if output_mode == "mask":
+            output_image_path = save_mask(mask, os.path.join(output_folder, mask_file_name(file_name)))
+        else:
+            # Same composition as rembg's naive cutout
+            output_image = composite(image, mask)
             output_image_path = os.path.join(output_folder, f"rm_{file_name.split('.')[0]}.png")
-            process_image(input_image_path, output_image_path)
+            output_image.save(output_image_path, format='PNG')
+        print(f"Processed and saved: {output_image_path}")
+        # Cached once the output is written, a cache failure never costs the frame
+        if cache is not None and cached_mask is None:
+            cache.put(key, mask)
+        return output_image_path
+
+    def on_error(file_name, error):
+        print(f"Failed to process {os.path.join(input_folder, file_name)}: {error}")
+
+    return run_pipeline(file_names, decode, infer, encode, decode_workers=decode_workers,
+                        encode_workers=encode_workers, max_pending=max_pending, on_error=on_error)
+
+def _remove_background_shard(input_folder, output_folder, file_names, model_name, threads,
+                             decode_workers, encode_workers, max_pending, cache, output_mode):
+    if cache is not None:
+        # The pickled copy carries the parent's counters, only report this shard's
+        cache.hits = cache.misses = 0
+    output_paths = _remove_background_files(input_folder, output_folder, file_names, model_name, threads,
+                                            decode_workers, encode_workers, max_pending, cache, output_mode)
+    return output_paths, (cache.hits, cache.misses) if cache is not None else (0, 0)
+
+def remove_background_rembg(input_folder, output_folder, model_name=DEFAULT_MODEL, threads=None, processes=1,
+                            decode_workers=4, encode_workers=2, max_pending=8, cache=None, output_mode="rgba"):
+    """ output_mode "rgba" writes rmbg/images/rm_<name>.png cutouts, "mask" only writes
+    8-bit masks to rmbg/masks/<file name>.png, applied on read by utils.open_masked """
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode: {output_mode}")
+    output_folder = create_mask_folder(output_folder) if output_mode == "mask" else create_output_folder(output_folder)
+    file_names = [file_name for file_name in os.listdir(input_folder) if is_image_file(file_name)]
+
+    if processes <= 1 or len(file_names) <= 1:
+        output_paths = _remove_background_files(input_folder, output_folder, file_names, model_name, threads,
+                                                decode_workers, encode_workers, max_pending, cache, output_mode)
+        if cache is not None:
+            print(cache.report())
+        return output_paths
+
+    # Each worker process holds its own session, split the cores between them unless told otherwise
+    processes = min(processes, len(file_names))
+    threads = threads or max(1, (os.cpu_count() or 1) // processes)
+    shard_size = -(-len(file_names) // processes)
+    shards = [file_names[i:i + shard_size] for i in range(0, len(file_names), shard_size)]
+    with process_pool(processes) as executor:
+        futures = [executor.submit(_remove_background_shard, input_folder, output_folder, shard, model_name, threads,
+                                   decode_workers, encode_workers, max_pending, cache, output_mode) for shard in shards]
+        output_paths = []
+        for future in futures:
+            shard_paths, (hits, misses) = future.result()
+            output_paths.extend(shard_paths)
+            if cache is not None:
+                cache.hits += hits
+                cache.misses += misses
+    if cache is not None:
+        print(cache.report())
+    return output_paths
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Remove background from images with rembg.")
+    parser.add_argument("--input_folder", type=str, required=True, help="Path to the folder containing input images.")
+    parser.add_argument("--output_folder", type=str, required=True, help="Path to the folder to save output images.")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help="rembg model name (u2net, u2netp, isnet-general-use, ...).")
+    parser.add_argument("--threads", type=int, default=None, help="Inference threads per session.")
+    parser.add_argument("--processes", type=int, default=1, help="Number of worker processes, each with its own session.")
+    parser.add_argument("--output_mode", choices=OUTPUT_MODES, default="rgba", help="Write RGBA cutouts or 8-bit masks only.")
+
+    args = parser.parse_args()
+    remove_background_rembg(args.input_folder, args.output_folder, args.model, args.threads, args.processes,
+                            output_mode=args.output_mode)
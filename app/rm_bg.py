@@ -4,85 +4,246 @@ import sys
 import numpy as np
 import torch
 import torch.nn.functional as F
-from torchvision.transforms.functional import normalize
-from huggingface_hub import hf_hub_download
-from briarmbg import BriaRMBG
-from PIL import Image
-
-from utils import create_output_folder
-
-# Initialize and load the model
-net = BriaRMBG()
-model_path = hf_hub_download("briaai/RMBG-1.4", 'model.pth')
-if torch.cuda.is_available():
-    net.load_state_dict(torch.load(model_path))
-    net = net.cuda()
-else:
-    net.load_state_dict(torch.load(model_path, map_location="cpu"))
-net.eval()
-
-def resize_image(image, size=(1024, 1024)):
-    image = image.convert('RGB')
-    orig_width, orig_height = image.size
+from PIL import Image, ImageOps
+
+from model_registry import briarmbg_version, get_model
+from utils import create_output_folder, create_mask_folder, mask_file_name, save_mask, run_pipeline, OUTPUT_MODES
+from utils import is_image_file
+
+DEFAULT_BATCH_SIZE = 4
+DEFAULT_MAX_SIZE = 1024
+RESOLUTION_POLICIES = ("fixed", "match", "dynamic")
+
+def is_out_of_memory(error):
+    message = str(error).lower()
+    return "out of memory" in message or "can't allocate memory" in message
+
+def letterbox(image_size, size=(1024, 1024)):
+    """ Return (left, top, width, height) of the resized image inside the padded size """
+    orig_width, orig_height = image_size
     ratio = min(size[0] / orig_width, size[1] / orig_height)
-    new_size = (int(orig_width * ratio), int(orig_height * ratio))
-    image = image.resize(new_size, Image.BILINEAR)
-    return image
+    width, height = int(orig_width * ratio), int(orig_height * ratio)
+    return (size[0] - width) // 2, (size[1] - height) // 2, width, height
 
-def pad_image(image, size=(1024, 1024)):
-    new_image = Image.new("RGB", size)
-    new_image.paste(image, ((size[0] - image.size[0]) // 2, (size[1] - image.size[1]) // 2))
-    return new_image
+def round_up(value, multiple):
+    return max(multiple, -(-int(value) // multiple) * multiple)
 
-def prepare_image(image, size=(1024, 1024)):
-    resized_image = resize_image(image, size)
-    padded_image = pad_image(resized_image, size)
-    return padded_image
+def inference_size(image_size, policy="fixed", max_size=DEFAULT_MAX_SIZE):
+    """ Return the (width, height) the image is letterboxed into for inference.
+    fixed: always max_size x max_size, the model's training resolution.
+    match: a square of the image's long side, never larger than max_size.
+    dynamic: the image's own aspect ratio, never larger than max_size.
+    match and dynamic are rounded up to a multiple of 32. """
+    if policy not in RESOLUTION_POLICIES:
+        raise ValueError(f"Unknown resolution policy: {policy}")
+    if policy == "fixed":
+        return max_size, max_size
 
-def process(image):
-    if not isinstance(image, Image.Image):
-        raise TypeError("Input must be a PIL image")
-
-    orig_image = image
-    w, h = orig_image.size
-    image = prepare_image(orig_image)
-    im_np = np.array(image)
-    im_tensor = torch.tensor(im_np, dtype=torch.float32).permute(2, 0, 1)
-    im_tensor = torch.unsqueeze(im_tensor, 0)
-    im_tensor = torch.divide(im_tensor, 255.0)
-    im_tensor = normalize(im_tensor, [0.5, 0.5, 0.5], [1.0, 1.0, 1.0])
-    if torch.cuda.is_available():
-        im_tensor = im_tensor.cuda()
+    width, height = image_size
+    scale = min(1.0, max_size / max(width, height))
+    width, height = round_up(width * scale, 32), round_up(height * scale, 32)
+    if policy == "match":
+        return max(width, height), max(width, height)
+    return width, height
 
-    result = net(im_tensor)
-    result = torch.squeeze(F.interpolate(result[0][0], size=(h, w), mode='bilinear'), 0)
+def image_to_array(image, mode):
+    # np.array copies once into a writable buffer, np.asarray of a PIL image is read-only
+    if image.mode != mode:
+        image = image.convert(mode)
+    return np.array(image)
+
+def to_tensor(image, size=None, policy="fixed", max_size=DEFAULT_MAX_SIZE):
+    """ Letterbox and normalize an image into a (3, H, W) tensor without intermediate PIL images:
+    an antialiased bilinear resize centered on black padding, scaled to [-0.5, 0.5].
+    The size is given explicitly or chosen by the resolution policy. """
+    if size is None:
+        size = inference_size(image.size, policy, max_size)
+    left, top, width, height = letterbox(image.size, size)
+    rgb = torch.from_numpy(image_to_array(image, 'RGB')).permute(2, 0, 1).unsqueeze(0)
+    resized = F.interpolate(rgb, size=(height, width), mode='bilinear', antialias=True, align_corners=False)
+
+    # Black padding is (0 / 255 - 0.5) / 1.0 once normalized
+    im_tensor = torch.full((3, size[1], size[0]), -0.5, dtype=torch.float32)
+    region = im_tensor[:, top:top + height, left:left + width]
+    region.copy_(resized[0])
+    region.div_(255.0).sub_(0.5)
+    return im_tensor
+
+def resample_weights(out_size, start, end, in_size):
+    """ (out_size, in_size) bilinear weights resampling the span [start, end) of an axis of in_size
+    pixels to out_size pixels, sampled as F.interpolate(align_corners=False) would sample the span
+    cropped out. Samples are clamped to the span so the pixels around it are never read. """
+    position = start + (torch.arange(out_size, dtype=torch.float32) + 0.5) * ((end - start) / out_size) - 0.5
+    last = max(start, end - 1)
+    position = position.clamp(start, last).clamp(0, in_size - 1)
+    low = position.floor().long()
+    high = (low + 1).clamp(max=in_size - 1)
+    fraction = position - low
+    weights = torch.zeros(out_size, in_size)
+    rows = torch.arange(out_size)
+    weights.index_put_((rows, low), 1 - fraction)
+    weights.index_put_((rows, high), fraction, accumulate=True)
+    return weights
+
+def mask_to_array(result, image_size, input_size=None, unpad=True):
+    """ Resample a (1, 1, H, W) prediction to image_size in a single bilinear pass.
+    input_size is the (width, height) of the network input, the prediction's own size by default;
+    BriaRMBG.inference predicts at half its input resolution.
+    With unpad only the letterbox region is resampled, in prediction coordinates, so the padding
+    never bleeds into the mask and the mask lines up with non-square images.
+    unpad=False reproduces the old behaviour of stretching the whole padded mask. """
+    w, h = image_size
+    result = result[0, 0].float()
+    rows, cols = result.shape
+    if input_size is None:
+        input_size = (cols, rows)
+    if unpad:
+        left, top, width, height = letterbox(image_size, input_size)
+    else:
+        left, top, width, height = 0, 0, input_size[0], input_size[1]
+    # The letterbox in prediction pixels may start and end on fractions of a pixel
+    scale_x, scale_y = cols / input_size[0], rows / input_size[1]
+    row_weights = resample_weights(h, top * scale_y, (top + height) * scale_y, rows).to(result.device)
+    col_weights = resample_weights(w, left * scale_x, (left + width) * scale_x, cols).to(result.device)
+    result = row_weights @ result @ col_weights.T
     ma = torch.max(result)
     mi = torch.min(result)
     result = (result - mi) / (ma - mi)
-    im_array = (result * 255).cpu().data.numpy().astype(np.uint8)
-    pil_im = Image.fromarray(np.squeeze(im_array))
-    new_im = Image.new("RGBA", pil_im.size, (0, 0, 0, 0))
-    new_im.paste(orig_image, mask=pil_im)
+    return (result * 255).to(torch.uint8).cpu().numpy()
 
-    return new_im
+def compose_rgba(image, mask):
+    """ Same result as pasting image on a transparent RGBA canvas through mask, as one array op """
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        src = image_to_array(image, 'RGBA')
+    else:
+        src = image_to_array(image, 'RGB')
+    # PIL blends with (a * m + 127) / 255 rounding, uint16 is enough for the product
+    scaled = src.astype(np.uint16)
+    scaled *= mask[..., None]
+    scaled += 127
+    scaled //= 255
+    out = np.empty(mask.shape + (4,), dtype=np.uint8)
+    out[..., :src.shape[2]] = scaled
+    if src.shape[2] == 3:
+        out[..., 3] = mask
+    return Image.fromarray(out, 'RGBA')
 
-def remove_background_briarmbg(input_folder, output_folder):
-    output_dir = create_output_folder(output_folder)
+def apply_mask(orig_image, result, input_size=None, unpad=True):
+    return compose_rgba(orig_image, mask_to_array(result, orig_image.size, input_size, unpad))
 
-    for file_name in os.listdir(input_folder):
-        if file_name.lower().endswith(('png', 'jpg', 'jpeg', 'bmp', 'tiff')):
-            input_image_path = os.path.join(input_folder, file_name)
-            image = Image.open(input_image_path)
-            output_image = process(image)
+def infer(batch):
+    net = get_model("briarmbg")
+    if torch.cuda.is_available():
+        batch = batch.cuda()
+    with torch.inference_mode():
+        return net.inference(batch)
+
+def infer_batched(tensors, batch_size=DEFAULT_BATCH_SIZE):
+    """ Run the network over a list of prepared tensors, batch_size at a time.
+    Only consecutive tensors of the same shape are batched together.
+    When a batch does not fit in memory the batch size is halved and the batch retried. """
+    masks = []
+    start = 0
+    while start < len(tensors):
+        end = start + 1
+        while end < min(len(tensors), start + batch_size) and tensors[end].shape == tensors[start].shape:
+            end += 1
+        chunk = tensors[start:end]
+        try:
+            masks.extend(infer(torch.stack(chunk)).split(1))
+        except RuntimeError as e:
+            if batch_size == 1 or not is_out_of_memory(e):
+                raise
+            batch_size = max(1, batch_size // 2)
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            print(f"Out of memory, retrying with batch size {batch_size}")
+            continue
+        start += len(chunk)
+    return masks, batch_size
+
+def process_batch(images, batch_size=DEFAULT_BATCH_SIZE, policy="fixed", max_size=DEFAULT_MAX_SIZE):
+    for image in images:
+        if not isinstance(image, Image.Image):
+            raise TypeError("Input must be a PIL image")
+
+    tensors = [to_tensor(image, policy=policy, max_size=max_size) for image in images]
+    masks, _ = infer_batched(tensors, batch_size)
+    return [apply_mask(image, mask, (tensor.shape[2], tensor.shape[1]))
+            for image, tensor, mask in zip(images, tensors, masks)]
+
+def process(image):
+    return process_batch([image], batch_size=1)[0]
+
+def remove_background_briarmbg(input_folder, output_folder, batch_size=DEFAULT_BATCH_SIZE,
+                               policy="fixed", max_size=DEFAULT_MAX_SIZE, decode_workers=4, encode_workers=2,
+                               cache=None, output_mode="rgba"):
+    """ output_mode "rgba" writes rmbg/images/rm_<name>.png cutouts, "mask" only writes
+    8-bit masks to rmbg/masks/<file name>.png, applied on read by utils.open_masked """
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode: {output_mode}")
+    output_dir = create_mask_folder(output_folder) if output_mode == "mask" else create_output_folder(output_folder)
+    file_names = [file_name for file_name in os.listdir(input_folder) if is_image_file(file_name)]
+    state = {"batch_size": batch_size}
+    # Masks are computed on the EXIF-upright image and resampled once from the model's own resolution,
+    # "upright" and "native" keep masks cached by older versions out
+    settings = ("briarmbg", briarmbg_version(), policy, max_size, "upright", "native") if cache is not None else None
+
+    def decode(file_name):
+        input_image_path = os.path.join(input_folder, file_name)
+        key = cache.key(input_image_path, *settings) if cache is not None else None
+        mask = cache.get(key) if cache is not None else None
+        image = ImageOps.exif_transpose(Image.open(input_image_path))
+        if mask is not None:
+            return image, key, None, np.array(mask)
+        return image, key, to_tensor(image, policy=policy, max_size=max_size), None
+
+    def infer_stage(decoded):
+        # Cached frames skip inference, the others keep their place in the batch
+        pending = [tensor for _, _, tensor, _ in decoded if tensor is not None]
+        masks = []
+        if pending:
+            # Remember a reduced batch size so later batches do not run out of memory again
+            masks, state["batch_size"] = infer_batched(pending, state["batch_size"])
+        masks = iter(masks)
+        return [next(masks) if tensor is not None else None for _, _, tensor, _ in decoded]
+
+    def encode(file_name, decoded, prediction):
+        image, key, tensor, cached_mask = decoded
+        if cached_mask is None:
+            mask = mask_to_array(prediction, image.size, (tensor.shape[2], tensor.shape[1]))
+        else:
+            mask = cached_mask
+        if output_mode == "mask":
+            output_image_path = save_mask(mask, os.path.join(output_dir, mask_file_name(file_name)))
+        else:
+            output_image = compose_rgba(image, mask)
             output_image_path = os.path.join(output_dir, f"rm_{os.path.splitext(file_name)[0]}.png")
             output_image.save(output_image_path)
-            print(f"Processed and saved: {output_image_path}")
+        print(f"Processed and saved: {output_image_path}")
+        # Cached once the output is written, a cache failure never costs the frame
+        if cache is not None and cached_mask is None:
+            cache.put(key, mask)
+        return output_image_path
+
+    output_paths = run_pipeline(file_names, decode, infer_stage, encode, batch_size=batch_size,
+                                decode_workers=decode_workers, encode_workers=encode_workers,
+                                max_pending=2 * batch_size)
+    if cache is not None:
+        print(cache.report())
+    return output_paths
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Remove background from images.")
     parser.add_argument("--input_folder", type=str, required=True, help="Path to the folder containing input images.")
     parser.add_argument("--output_folder", type=str, required=True, help="Path to the folder to save output images.")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="Number of images per forward pass.")
+    parser.add_argument("--resolution", choices=RESOLUTION_POLICIES, default="fixed",
+                        help="fixed: always max_size squared, match: square up to max_size, dynamic: input aspect ratio up to max_size.")
+    parser.add_argument("--max_size", type=int, default=DEFAULT_MAX_SIZE, help="Largest inference side in pixels.")
+    parser.add_argument("--output_mode", choices=OUTPUT_MODES, default="rgba", help="Write RGBA cutouts or 8-bit masks only.")
     
     args = parser.parse_args()
-    remove_background_briarmbg(args.input_folder, args.output_folder)
+    remove_background_briarmbg(args.input_folder, args.output_folder, args.batch_size, args.resolution, args.max_size,
+                               output_mode=args.output_mode)
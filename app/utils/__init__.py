@@ -1,3 +1,10 @@
-from .utils import create_output_folder, extract_frames, extract_images
-from .utils import create_thumbnail, create_video_output_folder, create_resize_output_folder
-from .utils import resize_image, process_images
\ No newline at end of file
+from .common import IMAGE_EXTENSIONS, is_image_file, process_context, process_pool
+from .utils import create_output_folder, extract_images
+from .utils import load_thumbnail, create_thumbnail, create_video_output_folder, create_resize_output_folder
+from .resize import resize_image, resize_files, process_images
+from .frames import FRAME_FORMATS, extract_frames, iter_frames
+from .pipeline import run_pipeline
+from .mask_cache import MaskCache
+from .thumbnail_cache import ThumbnailCache
+from .masks import OUTPUT_MODES, create_mask_folder, mask_file_name, find_mask, save_mask, composite, open_masked
+from .masks import write_colmap_masks
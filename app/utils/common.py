@@ -0,0 +1,19 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Image files the pipeline reads: frame extraction, resizing, background removal and COLMAP
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.webp')
+
+
+def is_image_file(file_name):
+    return file_name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def process_context():
+    """ Multiprocessing context for worker processes. spawn rather than fork: the GUI process
+    has Tk and worker threads running, which a forked child would inherit in an unusable state. """
+    return multiprocessing.get_context("spawn")
+
+
+def process_pool(processes):
+    return ProcessPoolExecutor(processes, mp_context=process_context())
@@ -0,0 +1,209 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from .common import process_context, process_pool
+from .keyframes import KeyframeSelector, window_for_budget
+
+# Default quality per format: PNG compression level 0-9 (OpenCV's default, fastest),
+# JPEG and WebP quality 0-100 (WebP above 100 is lossless)
+FRAME_FORMATS = {"png": 1, "jpg": 95, "webp": 95}
+
+
+def frame_encoder(frame_format="png", quality=None):
+    """ Return (file extension, cv2.imwrite params) for frame_format """
+    if frame_format not in FRAME_FORMATS:
+        raise ValueError(f"Unknown frame format {frame_format}, expected one of {', '.join(FRAME_FORMATS)}")
+    if quality is None:
+        quality = FRAME_FORMATS[frame_format]
+    if frame_format == "png":
+        return ".png", [cv2.IMWRITE_PNG_COMPRESSION, int(quality)]
+    if frame_format == "jpg":
+        return ".jpg", [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    return ".webp", [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+
+
+def _write_frame(frame_name, frame, params, slots, written):
+    try:
+        cv2.imwrite(frame_name, frame, params)
+        print(f"Extracted frame: {frame_name}")
+        if written is not None:
+            written.put(frame_name)
+        return frame_name
+    finally:
+        slots.release()
+
+
+def _target_frame(k, step):
+    # Frame nearest to the k-th target time k / frame_rate, step is fps / frame_rate
+    return int(k * step + 0.5)
+
+
+def _extract_segment(video_path, output_folder, step, start, end, writer_threads, keyframe_options=None,
+                     written=None, encoder=(".png", [])):
+    """ Extract the selected frames of [start, end), end=None reads until the end of the video.
+    Skipped frames are only grabbed, never converted, and encoding runs on a writer pool.
+    keyframe_options are KeyframeSelector arguments, without them every sampled frame is kept.
+    Each path is also put on the written queue, if given, as soon as the file exists.
+    encoder is the (extension, imwrite params) pair returned by frame_encoder. """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Error: Could not open video {video_path}.")
+        return []
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    # Bound the decoded frames waiting for the writers
+    slots = threading.BoundedSemaphore(writer_threads * 2)
+    futures = []
+    selector = KeyframeSelector(**(keyframe_options or {}))
+    # First target time that falls in this segment
+    k = max(0, int(start / step) - 1)
+    while _target_frame(k, step) < start:
+        k += 1
+    next_frame = _target_frame(k, step)
+    extension, params = encoder
+    with ThreadPoolExecutor(writer_threads) as writer:
+        def write(kept):
+            for index, kept_frame in kept:
+                frame_name = os.path.join(output_folder, f"frame_{index:04d}{extension}")
+                slots.acquire()
+                futures.append(writer.submit(_write_frame, frame_name, kept_frame, params, slots, written))
+
+        frame_idx = start
+        while end is None or frame_idx < end:
+            if frame_idx == next_frame:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                write(selector.offer(k, frame))
+                k += 1
+                next_frame = _target_frame(k, step)
+            elif not cap.grab():
+                break
+            frame_idx += 1
+        write(selector.flush())
+
+    cap.release()
+    return [future.result() for future in futures]
+
+
+def _plan_extraction(video_path, frame_rate, processes, budget, min_sharpness, max_hash_distance):
+    """ Return (step, segment bounds, keyframe options), raises ValueError when the video cannot be read """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video {video_path}.")
+
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    if fps == 0:
+        raise ValueError("Unable to retrieve video FPS.")
+
+    print(f"Video FPS: {fps}")
+
+    if frame_rate <= 0:
+        raise ValueError("The frame rate must be positive.")
+
+    # Sample at target times k / frame_rate and keep the nearest frame, so 29.97 fps sources
+    # are not drifted by an integer interval. Above the video rate every frame is kept once.
+    step = max(1.0, fps / frame_rate)
+    candidates = int((total_frames - 1) / step) + 1 if total_frames > 0 else 0
+    window = window_for_budget(candidates, budget)
+    keyframe_options = {"window": window, "min_sharpness": min_sharpness, "max_hash_distance": max_hash_distance}
+
+    if processes <= 1 or total_frames <= 0:
+        return step, [0, None], keyframe_options
+
+    # One time segment per process, each seeks to its first frame. Segments start on a keyframe
+    # window so no window is split. The frame count reported by the container can be wrong,
+    # so the last segment reads until the end of the video.
+    windows = -(-candidates // window)
+    starts = sorted({_target_frame(windows * i // processes * window, step) for i in range(processes)})
+    return step, starts + [None], keyframe_options
+
+
+def _run_extraction(video_path, output_folder, plan, writer_threads, written, encoder):
+    step, bounds, keyframe_options = plan
+    if len(bounds) == 2:
+        return _extract_segment(video_path, output_folder, step, bounds[0], bounds[1], writer_threads,
+                                keyframe_options, written, encoder)
+
+    with process_pool(len(bounds) - 1) as executor:
+        futures = [executor.submit(_extract_segment, video_path, output_folder, step,
+                                   bounds[i], bounds[i + 1], writer_threads, keyframe_options, written, encoder)
+                   for i in range(len(bounds) - 1)]
+        return [path for future in futures for path in future.result()]
+
+
+def iter_frames(video_path, output_folder, frame_rate, processes=1, writer_threads=4,
+                budget=None, min_sharpness=0.0, max_hash_distance=-1, frame_format="png", quality=None):
+    """
+    Streaming version of extract_frames: yields each frame path as soon as the file is written,
+    in completion order, while the rest of the video is still decoding.
+    Raises ValueError when the video cannot be read.
+    """
+    encoder = frame_encoder(frame_format, quality)
+    plan = _plan_extraction(video_path, frame_rate, processes, budget, min_sharpness, max_hash_distance)
+
+    manager = None
+    if len(plan[1]) > 2:
+        # Worker processes need a queue they can pickle
+        manager = process_context().Manager()
+        written = manager.Queue()
+    else:
+        written = queue.Queue()
+    errors = []
+
+    def run():
+        try:
+            _run_extraction(video_path, output_folder, plan, writer_threads, written, encoder)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            written.put(None)
+
+    thread = threading.Thread(target=run, name="extract_frames", daemon=True)
+    thread.start()
+    count = 0
+    try:
+        while True:
+            frame_name = written.get()
+            if frame_name is None:
+                break
+            count += 1
+            yield frame_name
+    finally:
+        thread.join()
+        if manager is not None:
+            manager.shutdown()
+
+    if errors:
+        raise errors[0]
+    print(f"Extracted {count} frames.")
+
+
+def extract_frames(video_path, output_folder, frame_rate, processes=1, writer_threads=4,
+                   budget=None, min_sharpness=0.0, max_hash_distance=-1, frame_format="png", quality=None):
+    """
+    Extract frames sampled at frame_rate. Keyframe selection is optional: with a budget, the
+    sharpest frame of each window of sampled frames is kept so about budget frames remain,
+    frames below min_sharpness (Laplacian variance) are dropped, and so are frames whose dhash
+    is within max_hash_distance bits of the previous kept frame.
+    frame_format is one of FRAME_FORMATS, quality overrides its default compression level or quality.
+    Returns the frame paths in video order, see iter_frames to consume them while extracting.
+    """
+    encoder = frame_encoder(frame_format, quality)
+    try:
+        plan = _plan_extraction(video_path, frame_rate, processes, budget, min_sharpness, max_hash_distance)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    extracted_image_paths = _run_extraction(video_path, output_folder, plan, writer_threads, None, encoder)
+    print(f"Extracted {len(extracted_image_paths)} frames.")
+    return extracted_image_paths
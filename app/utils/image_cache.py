@@ -0,0 +1,129 @@
+import os
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+
+class ImageCache:
+    """ On-disk cache of small images stored under their key, the least recently used ones are
+    evicted once the cache grows beyond max_bytes. Subclasses decide how keys are computed
+    and how images are encoded. """
+    extension = "png"
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # bytes on disk, computed on first write
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Picklable so worker processes can share the cache directory
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.{self.extension}"
+
+    def _save(self, image, path):
+        image.save(path, format='PNG', optimize=False, compress_level=6)
+
+    def get(self, key):
+        """ Return the cached image, or None """
+        path = self._path(key)
+        try:
+            image = Image.open(path)
+            image.load()
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return image
+
+    def put(self, key, image):
+        """ Store image under key. The cache is best effort: a failed write (unwritable directory,
+        full disk, missing encoder) is reported and ignored, callers keep their own result """
+        path = self._path(key)
+        tmp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so a concurrent reader never sees a partial file
+            self._save(image, tmp_path)
+            os.replace(tmp_path, path)
+
+            with self._lock:
+                if self._size is None:
+                    self._size = sum(entry.stat().st_size for entry in self._entries())
+                else:
+                    self._size += path.stat().st_size
+                over = self._size > self.max_bytes
+            if over:
+                self.evict()
+        except (OSError, ValueError, KeyError) as e:
+            # Pillow raises KeyError when it was built without the encoder
+            print(f"Could not write to cache {self.cache_dir}: {e}")
+            try:
+                tmp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        return list(self.cache_dir.glob(f"*/*.{self.extension}"))
+
+    def evict(self, target_ratio=0.9):
+        """ Delete least recently used images until the cache is below target_ratio * max_bytes,
+        the margin avoids rescanning the directory on every following write """
+        with self._lock:
+            entries = []
+            for entry in self._entries():
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+            size = sum(entry_size for _, entry_size, _ in entries)
+            target = self.max_bytes * target_ratio
+            for _, entry_size, entry in sorted(entries, key=lambda e: e[0]):
+                if size <= target:
+                    break
+                try:
+                    entry.unlink()
+                except OSError:
+                    continue
+                size -= entry_size
+            self._size = size
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries():
+                entry.unlink(missing_ok=True)
+            self._size = 0
+
+    def stats(self):
+        entries = self._entries()
+        size = 0
+        for entry in entries:
+            try:
+                size += entry.stat().st_size
+            except OSError:
+                pass
+        return {"hits": self.hits, "misses": self.misses, "entries": len(entries),
+                "size_bytes": size, "max_bytes": self.max_bytes}
+
+    def report(self, name="Image cache", unit="images"):
+        stats = self.stats()
+        return (f"{name}: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['entries']} {unit}, {stats['size_bytes'] / 1024 ** 2:.1f}/"
+                f"{stats['max_bytes'] / 1024 ** 2:.0f} MB")
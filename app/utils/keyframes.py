@@ -0,0 +1,82 @@
+import cv2
+import numpy as np
+
+
+def sharpness(frame, max_width=640):
+    """ Variance of the Laplacian, low for blurry frames. Measured on a downscaled copy for speed. """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    if w > max_width:
+        gray = cv2.resize(gray, (max_width, int(h * max_width / w)), interpolation=cv2.INTER_AREA)
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+
+def dhash(frame):
+    """ 64 bit difference hash, near-duplicate frames differ by a few bits """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), 'big')
+
+
+def hash_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def window_for_budget(candidates, budget):
+    """ Window size that keeps about budget frames out of candidates """
+    if not budget or budget <= 0:
+        return 1
+    return max(1, -(-candidates // budget))
+
+
+class KeyframeSelector:
+    """
+    Keep the sharpest candidate of each window of consecutive candidates, dropping frames that
+    are too blurry (sharpness below min_sharpness) or near duplicates of the last kept frame
+    (dhash distance up to max_hash_distance, -1 disables the check).
+
+    Windows are aligned on the candidate index, so time segments processed separately make the
+    same choices. Only the best frame of the current window is held in memory.
+    """
+    def __init__(self, window=1, min_sharpness=0.0, max_hash_distance=-1):
+        self.window = max(1, window)
+        self.min_sharpness = min_sharpness
+        self.max_hash_distance = max_hash_distance
+        self._best = None  # (score, index, frame) of the current window
+        self._window_index = None
+        self._last_hash = None
+
+    @property
+    def passthrough(self):
+        return self.window == 1 and self.min_sharpness <= 0 and self.max_hash_distance < 0
+
+    def offer(self, index, frame):
+        """ Offer candidate number index, returns the (index, frame) pairs to write """
+        if self.passthrough:
+            return [(index, frame)]
+
+        kept = []
+        window_index = index // self.window
+        if self._window_index is not None and window_index != self._window_index:
+            kept = self.flush()
+        self._window_index = window_index
+
+        score = sharpness(frame) if self.window > 1 or self.min_sharpness > 0 else 0.0
+        if score < self.min_sharpness:
+            return kept
+        if self._best is None or score > self._best[0]:
+            self._best = (score, index, frame)
+        return kept
+
+    def flush(self):
+        """ Return the pending frame of the current window, if it is kept """
+        if self._best is None:
+            return []
+        _, index, frame = self._best
+        self._best = None
+        if self.max_hash_distance >= 0:
+            frame_hash = dhash(frame)
+            if self._last_hash is not None and hash_distance(frame_hash, self._last_hash) <= self.max_hash_distance:
+                return []
+            self._last_hash = frame_hash
+        return [(index, frame)]
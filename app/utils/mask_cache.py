@@ -0,0 +1,42 @@
+import os
+import hashlib
+
+from PIL import Image
+
+from .image_cache import ImageCache
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "sylva3d", "masks")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MaskCache(ImageCache):
+    """ On-disk cache of background-removal alpha masks, keyed by image content and settings.
+    Masks are stored as 8-bit grayscale PNGs, the least recently used ones are evicted
+    once the cache grows beyond max_bytes. """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes)
+
+    def key(self, image_path, *settings):
+        """ settings identify how the mask was made: algorithm, model version, resolution... """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(hash_file(image_path).encode())
+        for setting in settings:
+            digest.update(b'\0' + str(setting).encode())
+        return digest.hexdigest()
+
+    def put(self, key, mask):
+        """ Store a mask given as an 'L' image or a 2D uint8 array """
+        if not isinstance(mask, Image.Image):
+            mask = Image.fromarray(mask, 'L')
+        super().put(key, mask)
+
+    def report(self):
+        return super().report("Mask cache", "masks")
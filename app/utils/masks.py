@@ -0,0 +1,139 @@
+import os
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps, ExifTags
+
+from .common import is_image_file
+
+OUTPUT_MODES = ("rgba", "mask")
+# Masks are stored in the EXIF-upright frame of their image, the frame rembg, cv2.imread and
+# ImageOps.exif_transpose use. EXIF orientation -> transpose that makes the raw image upright
+EXIF_TRANSPOSE = {2: Image.FLIP_LEFT_RIGHT, 3: Image.ROTATE_180, 4: Image.FLIP_TOP_BOTTOM,
+                  5: Image.TRANSPOSE, 6: Image.ROTATE_270, 7: Image.TRANSVERSE, 8: Image.ROTATE_90}
+# Transpose that brings an upright image back to the raw frame
+EXIF_UNDO = {**EXIF_TRANSPOSE, 6: Image.ROTATE_90, 8: Image.ROTATE_270}
+
+
+def create_mask_folder(output_dir):
+    mask_folder = os.path.join(output_dir, 'rmbg', 'masks')
+
+    if not os.path.exists(mask_folder):
+        os.makedirs(mask_folder)
+
+    return mask_folder
+
+
+def mask_file_name(image_file_name):
+    # COLMAP looks masks up as <image name>.png, keep the same convention
+    return f"{os.path.basename(image_file_name)}.png"
+
+
+def find_mask(image_path):
+    """ Return the mask written next to image_path by background removal, or None """
+    mask_path = os.path.join(os.path.dirname(image_path), 'rmbg', 'masks', mask_file_name(image_path))
+    return mask_path if os.path.exists(mask_path) else None
+
+
+def save_mask(mask, mask_path):
+    """ Write a mask given as an 'L' image or a 2D uint8 array as an 8-bit PNG """
+    if not isinstance(mask, Image.Image):
+        mask = Image.fromarray(mask, 'L')
+    mask.save(mask_path, format='PNG', compress_level=6)
+    return mask_path
+
+
+def composite(image, mask):
+    """ Transparent cutout of image through mask, same result as the RGBA files background removal writes.
+    Both must be in the same frame, a mask of another size raises ValueError """
+    if mask.size != image.size:
+        raise ValueError(f"Mask size {mask.size} does not match image size {image.size}")
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    return Image.composite(image, Image.new("RGBA", image.size, 0), mask)
+
+
+def open_masked(image_path):
+    """ Open image_path upright, applying its background mask on read when one exists.
+    A mask that does not match the image (stale, other frame) is ignored """
+    image = ImageOps.exif_transpose(Image.open(image_path))
+    mask_path = find_mask(image_path)
+    if mask_path is None:
+        return image
+    try:
+        return composite(image, Image.open(mask_path).convert('L'))
+    except ValueError as e:
+        print(f"Ignoring mask {mask_path}: {e}")
+        return image
+
+
+def apply_mask_array(image_bgr, mask_path, image_size):
+    """ Turn a BGR array into BGRA using the mask file. image_size is the (width, height) of the
+    upright full image the array was downsized from, the mask must have that size """
+    mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+    if mask is None:
+        raise ValueError(f"Could not read mask {mask_path}")
+    if (mask.shape[1], mask.shape[0]) != tuple(image_size):
+        raise ValueError(f"Mask size {mask.shape[1::-1]} does not match image size {tuple(image_size)}")
+    h, w = image_bgr.shape[:2]
+    if mask.shape != (h, w):
+        mask = cv2.resize(mask, (w, h), interpolation=cv2.INTER_AREA)
+    scaled = image_bgr.astype(np.uint16) * mask[..., None]
+    bgra = np.empty((h, w, 4), dtype=np.uint8)
+    bgra[..., :3] = (scaled + 127) // 255
+    bgra[..., 3] = mask
+    return bgra
+
+
+def write_colmap_masks(images_folder, threshold=128):
+    """
+    Write binary masks for COLMAP (--ImageReader.mask_path) to images_folder/rmbg/colmap_masks.
+
+    Each top-level image gets <file name>.png, black where the background was removed, so
+    SIFT extraction skips background pixels. Masks come from rmbg/masks, or from the alpha
+    channel of the rmbg/images/rm_<name>.png cutouts. COLMAP reads images without applying
+    their EXIF orientation, so the upright masks are turned back to the raw frame. Returns
+    the folder, or None when no image has a mask.
+    """
+    colmap_folder = os.path.join(images_folder, 'rmbg', 'colmap_masks')
+    if os.path.exists(colmap_folder):
+        # Never leave masks of a previous run behind for images that no longer have one
+        for file_name in os.listdir(colmap_folder):
+            os.remove(os.path.join(colmap_folder, file_name))
+
+    written = 0
+    for file_name in sorted(os.listdir(images_folder)):
+        image_path = os.path.join(images_folder, file_name)
+        if not os.path.isfile(image_path) or not is_image_file(file_name):
+            continue
+
+        mask = None
+        mask_path = find_mask(image_path)
+        cutout_path = os.path.join(images_folder, 'rmbg', 'images', f"rm_{os.path.splitext(file_name)[0]}.png")
+        if mask_path is not None:
+            mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+        elif os.path.exists(cutout_path):
+            cutout = cv2.imread(cutout_path, cv2.IMREAD_UNCHANGED)
+            if cutout is not None and cutout.ndim == 3 and cutout.shape[2] == 4:
+                mask = cutout[..., 3]
+        if mask is None:
+            continue
+
+        with Image.open(image_path) as image:
+            raw_size = image.size
+            orientation = image.getexif().get(ExifTags.Base.Orientation)
+        if orientation in EXIF_UNDO:
+            mask = np.asarray(Image.fromarray(mask).transpose(EXIF_UNDO[orientation]))
+        if (mask.shape[1], mask.shape[0]) != raw_size:
+            print(f"Skipping mask of {file_name}: size {mask.shape[1::-1]} does not match image size {raw_size}")
+            continue
+
+        os.makedirs(colmap_folder, exist_ok=True)
+        _, binary = cv2.threshold(mask, threshold - 1, 255, cv2.THRESH_BINARY)
+        cv2.imwrite(os.path.join(colmap_folder, mask_file_name(file_name)), binary)
+        written += 1
+
+    if written:
+        print(f"Wrote {written} COLMAP masks to {colmap_folder}")
+        return colmap_folder
+    return None
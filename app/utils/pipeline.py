@@ -0,0 +1,96 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+
+def run_pipeline(items, decode, infer, encode, batch_size=1, decode_workers=4, encode_workers=2,
+                 max_pending=8, on_error=None):
+    """
+    Run items through decode -> infer -> encode with the three stages overlapping.
+
+    decode(item) runs on a thread pool, infer(list_of_decoded) runs on the calling thread
+    and must return one result per input, encode(item, decoded, result) runs on a second
+    thread pool. At most max_pending items wait between each pair of stages, so memory
+    stays bounded whatever the number of items.
+
+    If on_error(item, exception) is given, a failing item is reported and skipped,
+    otherwise the first error stops the pipeline and is raised.
+    Returns the encode results in input order (skipped items are left out).
+    """
+    decoded = queue.Queue(maxsize=max_pending)
+    encode_slots = threading.BoundedSemaphore(max_pending)
+    stop = threading.Event()
+    outputs = []
+
+    def produce(decode_pool):
+        for item in items:
+            if stop.is_set():
+                break
+            decoded.put((item, decode_pool.submit(decode, item)))
+        decoded.put(_DONE)
+
+    def fail(item, error):
+        if on_error is None:
+            raise error
+        on_error(item, error)
+
+    def submit_encode(encode_pool, item, data, result):
+        encode_slots.acquire()
+        future = encode_pool.submit(encode, item, data, result)
+        future.add_done_callback(lambda f: encode_slots.release())
+        outputs.append((item, future))
+
+    def run_batch(encode_pool, batch):
+        try:
+            results = infer([data for _, data in batch])
+        except Exception as e:
+            if len(batch) == 1 or on_error is None:
+                fail(batch[0][0], e)
+                return
+            # Retry one by one so a single bad item does not drop the whole batch
+            for entry in batch:
+                run_batch(encode_pool, [entry])
+            return
+        for (item, data), result in zip(batch, results):
+            submit_encode(encode_pool, item, data, result)
+
+    with ThreadPoolExecutor(decode_workers) as decode_pool, ThreadPoolExecutor(encode_workers) as encode_pool:
+        producer = threading.Thread(target=produce, args=(decode_pool,), daemon=True)
+        producer.start()
+        finished = False
+        try:
+            batch = []
+            while True:
+                entry = decoded.get()
+                if entry is _DONE:
+                    finished = True
+                    break
+                item, future = entry
+                try:
+                    batch.append((item, future.result()))
+                except Exception as e:
+                    fail(item, e)
+                    continue
+                if len(batch) >= batch_size:
+                    run_batch(encode_pool, batch)
+                    batch = []
+            if batch:
+                run_batch(encode_pool, batch)
+        except BaseException:
+            # Unblock the producer before the executors wait for their workers
+            stop.set()
+            while not finished:
+                finished = decoded.get() is _DONE
+            raise
+        finally:
+            producer.join()
+
+    results = []
+    for item, future in outputs:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            fail(item, e)
+    return results
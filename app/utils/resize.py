@@ -0,0 +1,131 @@
+import os
+
+from PIL import Image
+
+from .common import process_pool
+from .utils import create_resize_output_folder
+
+# Downscales first reduce by an integer factor with a box filter, then LANCZOS the last
+# factor of at most REDUCING_GAP. At 3 the result is visually identical to a plain LANCZOS.
+REDUCING_GAP = 3.0
+# Memory the resize workers may use together, each worker can hold the largest image at once
+DEFAULT_MAX_MEMORY = int(os.environ.get("SYLVA3D_RESIZE_MAX_MEMORY_MB", 2048)) * 2 ** 20
+# Modes Image.reduce supports, other modes (P, 1, I;16...) are resized in one LANCZOS pass
+REDUCE_MODES = ("L", "LA", "RGB", "RGBA", "I", "F", "CMYK", "YCbCr")
+
+
+def scaled_size(size, scale_percent):
+    width, height = size
+    return max(1, int(width * scale_percent / 100)), max(1, int(height * scale_percent / 100))
+
+
+def resize_to(image, size):
+    if size[0] < image.width and size[1] < image.height and image.mode in REDUCE_MODES:
+        return image.resize(size, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+    return image.resize(size, Image.LANCZOS)
+
+
+def resize_image(image, scale_percent):
+    return resize_to(image, scaled_size(image.size, scale_percent))
+
+
+def draft_for_size(image, size):
+    """ Let the JPEG decoder skip DCT coefficients and deliver the smallest 1/2, 1/4 or 1/8
+    scale still at least size. A no-op for other formats, call it before the pixels are loaded. """
+    if size[0] < image.width and size[1] < image.height:
+        image.draft(image.mode, size)
+    return image
+
+
+def reduce_factor(image_size, size):
+    """ Integer box reduction applied before LANCZOS, the same factor reducing_gap would use """
+    return max(1, int(min(image_size[0] / size[0], image_size[1] / size[1]) / REDUCING_GAP))
+
+
+def estimate_memory(image_path, scale_percent):
+    """ Peak bytes resize_path needs for image_path, read from the header without decoding """
+    with Image.open(image_path) as image:
+        size = scaled_size(image.size, scale_percent)
+        draft_for_size(image, size)
+        width, height = image.size
+        # Pillow stores every multi-band pixel on 4 bytes
+        pixel_bytes = 1 if image.mode in ("1", "L", "P") else 4
+        reducible = image.mode in REDUCE_MODES
+    factor = reduce_factor((width, height), size) if reducible else 1
+    decoded = width * height * pixel_bytes
+    reduced = decoded // factor ** 2 if factor > 1 else 0
+    # LANCZOS resamples horizontally first, into an output width x source height buffer
+    horizontal = size[0] * (height // factor) * pixel_bytes
+    return decoded + reduced + horizontal + size[0] * size[1] * pixel_bytes
+
+
+def resize_path(image_path, scale_percent):
+    """
+    Resize the image at image_path. JPEGs are draft-decoded near the output size, large
+    downscales are box-reduced first and the full decode is released before the LANCZOS pass.
+    """
+    image = Image.open(image_path)
+    try:
+        size = scaled_size(image.size, scale_percent)
+        draft_for_size(image, size)
+        if image.mode not in REDUCE_MODES:
+            return resize_to(image, size)
+        factor = reduce_factor(image.size, size)
+        box = (0, 0) + image.size
+        if factor > 1:
+            reduced = image.reduce(factor)
+            image.close()
+            image = reduced
+            # The last reduced row and column may cover a partial block, keep the exact extent
+            box = (0, 0, box[2] / factor, box[3] / factor)
+        return image.resize(size, Image.LANCZOS, box=box)
+    finally:
+        image.close()
+
+
+def resize_file(task):
+    """ Resize one (input path, output path, scale percent) task, returns the output path """
+    image_path, output_image_path, scale_percent = task
+    resized_image = resize_path(image_path, scale_percent)
+    try:
+        resized_image.save(output_image_path)
+    finally:
+        resized_image.close()
+    print(f"Processed and saved: {output_image_path}")
+    return output_image_path
+
+
+def resize_files(tasks, processes=None, chunksize=None, max_memory=DEFAULT_MAX_MEMORY):
+    """
+    Run resize_file over tasks on a process pool sized to the cores, results keep the task order.
+    Tasks are sent in chunks so workers do not wait on the pool for every image.
+    With max_memory (bytes), fewer workers are started when the largest image would not fit
+    max_memory once per worker.
+    """
+    tasks = list(tasks)
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    if max_memory and processes > 1:
+        peak = max(estimate_memory(image_path, scale_percent) for image_path, _, scale_percent in tasks)
+        if peak * processes > max_memory:
+            processes = max(1, max_memory // peak)
+            print(f"Resizing with {processes} processes, up to {peak / 2 ** 20:.0f} MB per image")
+    if processes <= 1:
+        return [resize_file(task) for task in tasks]
+
+    if chunksize is None:
+        # About four chunks per worker balances uneven image sizes against dispatch overhead
+        chunksize = max(1, len(tasks) // (processes * 4))
+    with process_pool(processes) as executor:
+        return list(executor.map(resize_file, tasks, chunksize=chunksize))
+
+
+def process_images(image_paths, scale_percent, processes=None, max_memory=DEFAULT_MAX_MEMORY):
+    if not image_paths:
+        print("No images to process.")
+        return []
+
+    input_folder = os.path.dirname(image_paths[0])
+    output_folder = create_resize_output_folder(input_folder)
+    tasks = [(image_path, os.path.join(output_folder, os.path.basename(image_path)), scale_percent)
+             for image_path in image_paths]
+    return resize_files(tasks, processes, max_memory=max_memory)
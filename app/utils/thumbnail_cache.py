@@ -0,0 +1,36 @@
+import os
+import hashlib
+
+from .image_cache import ImageCache
+from .masks import find_mask
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "sylva3d", "thumbnails")
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+class ThumbnailCache(ImageCache):
+    """ On-disk cache of grid thumbnails, keyed by image path, modification time and size.
+    A background mask written next to the image is part of the key, since thumbnails are
+    drawn through it. Thumbnails are stored as WebP, which keeps their alpha channel. """
+    extension = "webp"
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes)
+
+    def key(self, image_path, *settings):
+        """ settings identify how the thumbnail was made, e.g. its size. Reads file stats only. """
+        digest = hashlib.blake2b(digest_size=20)
+        for path in (image_path, find_mask(image_path)):
+            if path is None:
+                continue
+            stat = os.stat(path)
+            digest.update(f"{os.path.abspath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}\0".encode())
+        for setting in settings:
+            digest.update(b'\0' + str(setting).encode())
+        return digest.hexdigest()
+
+    def _save(self, image, path):
+        image.save(path, format='WEBP', quality=85, method=0)
+
+    def report(self):
+        return super().report("Thumbnail cache", "thumbnails")
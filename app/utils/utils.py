@@ -6,11 +6,16 @@ At Sylvagreg company
 Big data engineer student
 """
 
+import io
 import cv2
-from PIL import Image, ImageTk
+import numpy as np
+from PIL import Image, ImageTk, ExifTags
 import os
 from pathlib import Path
 
+from .common import is_image_file
+from .masks import find_mask, apply_mask_array, EXIF_TRANSPOSE
+
 
 def create_output_folder(output_dir):
     output_folder = os.path.join(output_dir,'rmbg', 'images')
@@ -21,7 +26,6 @@ def create_output_folder(output_dir):
     return output_folder
 
 def extract_images(path):
-    image_formats = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')
     images = []
 
     path = Path(path)
@@ -30,18 +34,91 @@ def extract_images(path):
         return images
 
     for file in path.rglob('*'):
-        if file.is_file() and file.suffix.lower() in image_formats:
+        # Background masks are applied on read and COLMAP masks are derived from them,
+        # neither are images of their own
+        if file.parent.name in ('masks', 'colmap_masks') and file.parent.parent.name == 'rmbg':
+            continue
+        if file.is_file() and is_image_file(file.name):
             images.append(str(file))
 
     return images
 
-def create_thumbnail(image_path, max_size=(100, 100)):
+# libjpeg decodes at 1/2, 1/4 or 1/8 scale for a fraction of the cost of a full decode
+REDUCED_COLOR_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+def exif_thumbnail(image, min_size):
+    """ BGR array of the thumbnail embedded in the EXIF data of a JPEG, or None when there is
+    none, it is smaller than min_size or its aspect ratio differs from the image (letterboxed) """
+    exif_data = image.info.get("exif")
+    if not exif_data:
+        return None
+    exif = image.getexif()
+    ifd1 = exif.get_ifd(ExifTags.IFD.IFD1)
+    offset = ifd1.get(ExifTags.Base.JpegIFOffset)
+    length = ifd1.get(ExifTags.Base.JpegIFByteCount)
+    if not offset or not length:
+        return None
+    # Offsets are relative to the TIFF header, after the "Exif\0\0" marker
+    with Image.open(io.BytesIO(exif_data[6 + offset:6 + offset + length])) as thumbnail:
+        thumbnail = thumbnail.convert("RGB")
+    w, h = image.size
+    if abs(thumbnail.width / thumbnail.height - w / h) > 0.01 * w / h:
+        return None
+    orientation = exif.get(ExifTags.Base.Orientation)
+    if orientation in EXIF_TRANSPOSE:
+        thumbnail = thumbnail.transpose(EXIF_TRANSPOSE[orientation])
+        if orientation >= 5:
+            min_size = min_size[::-1]
+    if thumbnail.width < min_size[0] or thumbnail.height < min_size[1]:
+        return None
+    return cv2.cvtColor(np.asarray(thumbnail), cv2.COLOR_RGB2BGR)
+
+def _read_full(image_path):
     image = cv2.imread(image_path)
+    return image, (image.shape[1], image.shape[0]) if image is not None else None
+
+def read_for_thumbnail(image_path, max_size=(100, 100)):
+    """ BGR array at least as large as the max_size thumbnail and the (width, height) of the
+    upright full image, decoded as cheaply as possible: the EXIF thumbnail of a JPEG when it
+    is large enough, else a reduced-scale JPEG decode. Both follow the EXIF orientation """
+    try:
+        with Image.open(image_path) as image:
+            w, h = image.size
+            scale = min(max_size[0] / w, max_size[1] / h)
+            if image.format != "JPEG":
+                return _read_full(image_path)
+            orientation = image.getexif().get(ExifTags.Base.Orientation)
+            full_size = (h, w) if orientation in (5, 6, 7, 8) else (w, h)
+            thumbnail = exif_thumbnail(image, (int(w * scale), int(h * scale)))
+            if thumbnail is not None:
+                return thumbnail, full_size
+    except (OSError, ValueError, SyntaxError):
+        return _read_full(image_path)
+    for factor, flag in REDUCED_COLOR_FLAGS:
+        if factor * scale <= 1:
+            return cv2.imread(image_path, flag), full_size
+    return _read_full(image_path)
+
+def load_thumbnail(image_path, max_size=(100, 100)):
+    """ Decode and downsize image_path to a PIL image, safe to call from worker threads """
+    image, full_size = read_for_thumbnail(image_path, max_size)
+    if image is None:
+        raise ValueError(f"Could not read image {image_path}")
     h, w = image.shape[:2]
     scale = min(max_size[0] / w, max_size[1] / h)
-    thumbnail = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    thumbnail = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    mask_path = find_mask(image_path)
+    if mask_path is not None:
+        try:
+            thumbnail = cv2.cvtColor(apply_mask_array(thumbnail, mask_path, full_size), cv2.COLOR_BGRA2RGBA)
+            return Image.fromarray(thumbnail)
+        except ValueError as e:
+            print(f"Ignoring mask {mask_path}: {e}")
     thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2RGB)
-    return ImageTk.PhotoImage(Image.fromarray(thumbnail))
+    return Image.fromarray(thumbnail)
+
+def create_thumbnail(image_path, max_size=(100, 100)):
+    return ImageTk.PhotoImage(load_thumbnail(image_path, max_size))
 
 def create_video_output_folder(output_dir, video_path):
     video_basename = os.path.splitext(os.path.basename(video_path))[0]
@@ -58,67 +135,3 @@ def create_resize_output_folder(input_folder):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     return output_folder
-
-def resize_image(image, scale_percent):
-    width = int(image.width * scale_percent / 100)
-    height = int(image.height * scale_percent / 100)
-    resized_image = image.resize((width, height), Image.LANCZOS)
-    return resized_image
-
-def process_images(image_paths, scale_percent):
-    if not image_paths:
-        print("No images to process.")
-        return []
-    
-    input_folder = os.path.dirname(image_paths[0])
-    output_folder = create_resize_output_folder(input_folder)
-    resized_image_paths = []
-
-    for image_path in image_paths:
-        image = Image.open(image_path)
-        resized_image = resize_image(image, scale_percent)
-        output_image_path = os.path.join(output_folder, os.path.basename(image_path))
-        resized_image.save(output_image_path)
-        resized_image_paths.append(output_image_path)
-        print(f"Processed and saved: {output_image_path}")
-    
-    return resized_image_paths
-
-def extract_frames(video_path, output_folder, frame_rate):
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print(f"Error: Could not open video {video_path}.")
-        return
-
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    
-    if fps == 0:
-        print("Error: Unable to retrieve video FPS.")
-        return
-
-    print(f"Video FPS: {fps}")
-
-    interval = int(fps / frame_rate)
-
-    frame_idx = 0
-    extracted_frame_idx = 0
-    extracted_image_paths = []
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if frame_idx % interval == 0:
-            frame_name = os.path.join(output_folder, f"frame_{extracted_frame_idx:04d}.png")
-            cv2.imwrite(frame_name, frame)
-            print(f"Extracted frame: {frame_name}")
-            extracted_image_paths.append(frame_name)
-            extracted_frame_idx += 1
-
-        frame_idx += 1
-
-    cap.release()
-    print(f"Extracted {extracted_frame_idx} frames.")
-    return extracted_image_paths